@@ -131,6 +131,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "cart.middleware.CartMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -227,6 +228,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL    = 'main.User'
 
 
+# CACHE SETTINGS ===============================================================
+
+# locmemcache:// — память процесса; при нескольких воркерах нужен общий кэш
+# ( rediscache://..., filecache:///path ), иначе сброс версий виден только своему процессу
+CACHES = {
+    "default": env.cache( 'CACHE_URL', default = 'locmemcache://shaurmania' ),
+}
+
+# Сколько секунд живут фрагменты страниц; при изменении моделей устаревают сразу — по версиям
+PAGE_CACHE_TIMEOUT = int( env( 'PAGE_CACHE_TIMEOUT', default = 600 ) )
+
+
 # LOGS SUBSYSTEM ===============================================================
 
 LOG_DIR = BASE_DIR / env( 'LOG_DIR', default = 'logs' )
@@ -563,6 +576,28 @@ MIN_AGE_REGISTRATION = env( 'MIN_AGE_REGISTRATION', default = 14 )
 MAX_AGE_REGISTRATION = env( 'MAX_AGE_REGISTRATION', default = 100 )
 
 
+# CART SETTINGS ================================================================
+
+# 'db' — корзина анонимов в таблице Cart по ключу сессии,
+# 'session' — корзина анонимов только в сессии, переносится в Cart при входе
+CART_ANONYMOUS_STORE = env( 'CART_ANONYMOUS_STORE', default = 'db' )
+
+# Сколько секунд процесс держит в памяти список действующих промокодов
+PROMOCODE_CACHE_TTL = int( env( 'PROMOCODE_CACHE_TTL', default = 300 ) )
+
+# purge_carts: через сколько дней корзина пользователя без изменений считается брошенной
+# и сколько строк удаляется за одну транзакцию
+CART_IDLE_DAYS = int( env( 'CART_IDLE_DAYS', default = 30 ) )
+CART_PURGE_BATCH_SIZE = int( env( 'CART_PURGE_BATCH_SIZE', default = 500 ) )
+
+
+# SEARCH SETTINGS ==============================================================
+
+# main.search.backends.Fts5SearchBackend — индекс SQLite FTS5,
+# main.search.backends.SimpleSearchBackend — icontains без индекса ( для других СУБД )
+SEARCH_BACKEND = env( 'SEARCH_BACKEND', default = 'main.search.backends.Fts5SearchBackend' )
+
+
 # OTHER SETTINGS ===============================================================
 
 AVATARS_COUNT = 81
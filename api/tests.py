@@ -1,3 +1,93 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from cart.models import Cart
+from main.factories import ShaurmaCategoryFactory, ShaurmaFactory, UserFactory
+
+
+class CartApiTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.item = ShaurmaFactory(price=100)
+        Cart.objects.set_quantities({'user': self.user}, {self.item.id: 2})
+
+    def test_compact_payload_with_etag(self):
+        resp = self.client.get(reverse('api_cart'))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['ETag'].startswith('"v'))
+        self.assertIn('no-cache', resp['Cache-Control'])
+        data = resp.json()
+        self.assertEqual((data['count'], data['total']), (2, 200))
+        self.assertEqual(data['items'], [{'id': self.item.id, 'quantity': 2, 'total': 200}])
+
+    def test_unchanged_cart_answers_304(self):
+        etag = self.client.get(reverse('api_cart'))['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('api_cart'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+        cart_queries = [q['sql'] for q in ctx.captured_queries if 'cart_' in q['sql']]
+        self.assertEqual(len(cart_queries), 1)
+        self.assertIn('cart_cartsummary', cart_queries[0])
+
+    def test_etag_changes_after_mutation(self):
+        etag = self.client.get(reverse('api_cart'))['ETag']
+        self.client.get(reverse('cart_add', kwargs={'shaurma_id': self.item.id}))
+
+        resp = self.client.get(reverse('api_cart'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(resp.json()['count'], 3)
+
+    def test_etag_differs_between_owners(self):
+        etag = self.client.get(reverse('api_cart'))['ETag']
+
+        other = UserFactory()
+        Cart.objects.set_quantities({'user': other}, {self.item.id: 5})
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.get(reverse('api_cart'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_fields_projection(self):
+        resp = self.client.get(reverse('api_cart'), {'fields': 'count'})
+        self.assertEqual(resp.json(), {'count': 2})
+
+        self.assertEqual(self.client.get(reverse('api_cart'), {'fields': 'picture'}).status_code, 400)
+
+
+class SearchSuggestApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ShaurmaCategoryFactory(name='Классика')
+        self.item = ShaurmaFactory(name='Шаурма с курицей', category=category)
+        ShaurmaFactory(name='Шаурма сырная', category=category, is_available=False)
+
+    def test_suggestions_payload(self):
+        resp = self.client.get(reverse('search_suggest'), {'q': 'ifehvf'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {
+            'query': 'ifehvf',
+            'suggestions': [{
+                'name': 'Шаурма с курицей',
+                'slug': self.item.slug,
+                'url': reverse('product', kwargs={'slug': self.item.slug}),
+            }],
+        })
+
+    def test_empty_query_and_limit_cap(self):
+        self.assertEqual(self.client.get(reverse('search_suggest'), {'q': '  '}).json()['suggestions'], [])
+
+        resp = self.client.get(reverse('search_suggest'), {'q': 'шаур', 'limit': 'abc'})
+        self.assertEqual(len(resp.json()['suggestions']), 1)
+
+    def test_post_not_allowed(self):
+        self.assertEqual(self.client.post(reverse('search_suggest'), {'q': 'шаур'}).status_code, 405)
@@ -7,5 +7,9 @@ urlpatterns = [
     path('admin/factories',            v.admin_factories,        name = 'admin_factories'),
     path('admin/factories/<str:name>', v.admin_factory_generate, name = 'admin_factory_generate'),
 
-    path('geo_code/<str:ip>',          v.geo_code,               name = 'geo_code')
+    path('geo_code/<str:ip>',          v.geo_code,               name = 'geo_code'),
+
+    path('cart',                       v.cart,                   name = 'api_cart'),
+
+    path('search/suggest',             v.search_suggest,         name = 'search_suggest'),
 ]
@@ -1,7 +1,12 @@
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 
+from cart.middleware import get_request_cart
+from cart.utils import parse_fields
 from geodata.utils import get_country_by_ip
+from main.search.suggest import suggest_index
 
 from main.factories import (
     ShaurmaFactory,
@@ -96,3 +101,34 @@ def admin_factory_generate(request, name):
 
 def geo_code( request, ip ):
     return JsonResponse( _serialize_factory_object( get_country_by_ip( ip ) ) )
+
+
+def _cart_etag( request ):
+    return get_request_cart( request ).etag
+
+
+@require_GET
+@cache_control( private = True, no_cache = True )
+@condition( etag_func = _cart_etag )
+def cart( request ):
+    cart_state = get_request_cart( request )
+    try:
+        fields = parse_fields( request.GET.get( 'fields' ), cart_state.COMPACT_FIELDS )
+    except ValueError as e:
+        return JsonResponse( { 'detail': str( e ) }, status = 400 )
+
+    return JsonResponse( cart_state.compact( fields or cart_state.COMPACT_FIELDS ) )
+
+
+@require_GET
+def search_suggest( request ):
+    query = request.GET.get( 'q', '' ).strip()[ :100 ]
+
+    try:
+        limit = int( request.GET.get( 'limit', '8' ) )
+    except ValueError:
+        limit = 8
+    limit = max( 1, min( limit, 20 ) )
+
+    suggestions = suggest_index.suggest( query, limit ) if query else []
+    return JsonResponse( { 'query': query, 'suggestions': suggestions } )
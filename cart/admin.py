@@ -1,12 +1,20 @@
 from django.contrib import admin
-from .models import Order, Cart, Promocode
+from .models import OrderHeader, OrderLine, Cart, CartSummary, Promocode, ShaurmaStats
 
 
-@admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_code', 'user', 'shaurma', 'quantity', 'line_total', 'date']
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    fields = ['shaurma', 'quantity', 'unit_price', 'line_subtotal', 'line_discount', 'line_total']
+    readonly_fields = fields
+
+
+@admin.register(OrderHeader)
+class OrderHeaderAdmin(admin.ModelAdmin):
+    list_display = ['order_code', 'user', 'promocode', 'total', 'date']
     list_filter = ['date', 'is_demo_payment']
-    search_fields = ['order_code', 'user__username', 'shaurma__name']
+    search_fields = ['order_code', 'user__username', 'lines__shaurma__name']
+    inlines = [OrderLineInline]
 
 
 @admin.register(Cart)
@@ -16,6 +24,20 @@ class CartAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'item__name', 'session_key')
 
 
+@admin.register(CartSummary)
+class CartSummaryAdmin(admin.ModelAdmin):
+    list_display = ('owner_key', 'item_count', 'subtotal', 'version', 'updated_at')
+    search_fields = ('owner_key',)
+    readonly_fields = ('owner_key', 'item_count', 'subtotal', 'version', 'updated_at')
+
+
+@admin.register(ShaurmaStats)
+class ShaurmaStatsAdmin(admin.ModelAdmin):
+    list_display = ('shaurma', 'order_count', 'units_sold', 'revenue', 'units_7d', 'units_30d', 'last_ordered_at')
+    search_fields = ('shaurma__name',)
+    readonly_fields = list_display + ('updated_at',)
+
+
 @admin.register( Promocode )
 class PromocodeAdmin( admin.ModelAdmin ):
     list_display = [ 'code_name', 'code_uuid', 'duration', 'discount', 'date_add', 'date_end' ]
@@ -0,0 +1,131 @@
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from cart.models import Cart, CartSummary
+
+
+DB_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+class Command( BaseCommand ):
+    help = "Удаление брошенных корзин: гостевых с истёкшей сессией и давно не менявшихся корзин пользователей"
+
+    def add_arguments( self, parser ):
+        parser.add_argument(
+            "--days",
+            type = int,
+            default = settings.CART_IDLE_DAYS,
+            help = "Через сколько дней без изменений корзина пользователя считается брошенной",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type = int,
+            default = settings.CART_PURGE_BATCH_SIZE,
+            help = "Сколько строк удалять за одну транзакцию",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action = "store_true",
+            help = "Только посчитать строки, ничего не удаляя",
+        )
+
+    def guest_carts( self ):
+        """Гостевые позиции, чья сессия истекла или удалена."""
+        guests = Cart.objects.filter( user__isnull = True, session_key__isnull = False )
+
+        if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+            alive = Session.objects.filter( expire_date__gt = timezone.now() ).values( 'session_key' )
+            return guests.exclude( session_key__in = alive )
+
+        # Файловые и кэш-сессии сами исчезают по истечении — проверяем каждый ключ
+        store = import_module( settings.SESSION_ENGINE ).SessionStore()
+        keys = guests.values_list( 'session_key', flat = True ).distinct()
+        return guests.filter( session_key__in = [ key for key in keys if not store.exists( key ) ] )
+
+    def idle_user_carts( self, days: int ):
+        """Корзины пользователей, в которых ничего не менялось дольше days дней (целиком, а не по позициям)."""
+        idle_users = (
+            Cart.objects
+            .filter( user__isnull = False )
+            .values( 'user' )
+            .annotate( last_update = Max( 'updated_at' ) )
+            .filter( last_update__lt = timezone.now() - timedelta( days = days ) )
+            .values( 'user' )
+        )
+        return Cart.objects.filter( user__in = idle_users )
+
+    def purge( self, queryset, batch_size: int ) -> tuple[int, int]:
+        """Удаляет строки пачками по batch_size, каждая пачка — отдельная короткая транзакция."""
+        deleted = 0
+        summaries = 0
+
+        while True:
+            batch = list( queryset.order_by( 'pk' ).values_list( 'pk', 'user_id', 'session_key' )[ :batch_size ] )
+            if not batch:
+                break
+
+            user_ids = { user_id for _, user_id, _ in batch if user_id }
+            session_keys = { key for _, user_id, key in batch if not user_id }
+
+            with transaction.atomic():
+                deleted += Cart.objects.filter( pk__in = [ pk for pk, _, _ in batch ] ).delete()[ 0 ]
+                summaries += self.reset_summaries( user_ids, session_keys )
+
+        return deleted, summaries
+
+    @staticmethod
+    def reset_summaries( user_ids: set, session_keys: set ) -> int:
+        """
+        Итоги опустевших гостевых корзин удаляются — сессия уже не вернётся.
+        У пользователей итог обнуляется с новой версией, чтобы версии корзины не повторялись.
+        """
+        still_filled = Cart.objects.filter( Q( user_id__in = user_ids ) | Q( session_key__in = session_keys ) )
+        user_ids -= set( still_filled.values_list( 'user_id', flat = True ) )
+        session_keys -= set( still_filled.values_list( 'session_key', flat = True ) )
+
+        removed = CartSummary.objects.filter(
+            pk__in = [ CartSummary.key_for( { 'session_key': key } ) for key in session_keys ]
+        ).delete()[ 0 ]
+        reset = CartSummary.objects.filter(
+            pk__in = [ CartSummary.key_for( { 'user_id': user_id } ) for user_id in user_ids ]
+        ).update( item_count = 0, subtotal = 0, version = F( 'version' ) + 1, updated_at = timezone.now() )
+        return removed + reset
+
+    def handle( self, *args, **options ):
+        if options["batch_size"] < 1:
+            raise CommandError( "--batch-size должен быть положительным" )
+
+        started = time.monotonic()
+        targets = (
+            ( "гостевых (сессия истекла)", self.guest_carts() ),
+            ( f"пользовательских (без изменений > {options['days']} дн.)", self.idle_user_carts( options["days"] ) ),
+        )
+
+        if options["dry_run"]:
+            for label, queryset in targets:
+                self.stdout.write( f"Будет удалено {label}: {queryset.count()}" )
+            return
+
+        total = 0
+        total_summaries = 0
+        for label, queryset in targets:
+            deleted, summaries = self.purge( queryset, options["batch_size"] )
+            self.stdout.write( f"Удалено {label}: {deleted}" )
+            total += deleted
+            total_summaries += summaries
+
+        self.stdout.write( self.style.SUCCESS(
+            f"Удалено позиций корзины: {total}, итогов обновлено: {total_summaries} "
+            f"за {time.monotonic() - started:.2f} с"
+        ) )
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cart.models import ShaurmaStats
+
+
+class Command( BaseCommand ):
+    help = "Пересчёт популярности товаров ( ShaurmaStats ) по всем заказам: сдвигает окна 7/30 дней"
+
+    def handle( self, *args, **options ):
+        started = time.monotonic()
+        count = ShaurmaStats.objects.rollup()
+
+        self.stdout.write( self.style.SUCCESS(
+            f"Пересчитана популярность товаров: {count} за {time.monotonic() - started:.2f} с"
+        ) )
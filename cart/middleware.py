@@ -0,0 +1,104 @@
+import hashlib
+from functools import cached_property
+
+from cart.pricing import CartPricer, CartPricing
+from cart.stores import CartTotals
+
+
+class RequestCart( CartPricer ):
+    """
+    Корзина текущего запроса: читается не более одного раза и только при первом обращении.
+    Изменения идут через неё же, чтобы сбросить запомненное состояние.
+    """
+
+    @cached_property
+    def pricing( self ) -> CartPricing:
+        return self.price()
+
+    COMPACT_FIELDS = ( 'count', 'total', 'version', 'items' )
+
+    @cached_property
+    def summary( self ) -> CartTotals:
+        return self.store.summary()
+
+    @property
+    def count( self ) -> int:
+        # Если позиции уже прочитаны — берём из них, иначе одно чтение CartSummary
+        if 'pricing' in self.__dict__:
+            return self.pricing.count
+        return self.summary.count
+
+    @property
+    def total( self ) -> int:
+        if 'pricing' in self.__dict__:
+            return self.pricing.subtotal
+        return self.summary.total
+
+    @property
+    def version( self ) -> int:
+        return self.summary.version
+
+    @property
+    def etag( self ) -> str:
+        """
+        Сильный ETag: версия корзины + владелец, чтобы после входа/выхода не совпасть с чужой версией.
+        Для сессионной корзины добавляется версия цен каталога.
+        """
+        user = self.request.user
+        owner = f'u:{user.pk}' if user.is_authenticated else f's:{self.request.session.session_key or ""}'
+        digest = hashlib.blake2s( owner.encode(), digest_size = 6 ).hexdigest()
+        return f'"v{self.version}{self.store.etag_suffix()}-{digest}"'
+
+    def compact( self, fields = COMPACT_FIELDS ) -> dict:
+        """Только запрошенные поля; без items позиции с товарами не читаются."""
+        data = {}
+        if 'items' in fields:
+            data['items'] = [ line.as_compact_dict() for line in self.pricing.lines ]
+        if 'count' in fields:
+            data['count'] = self.count
+        if 'total' in fields:
+            data['total'] = self.total
+        if 'version' in fields:
+            data['version'] = self.version
+        return data
+
+    @property
+    def quantities( self ) -> dict:
+        return self.pricing.quantities
+
+    def add( self, item_id: int ) -> bool:
+        added = self.store.add( item_id )
+        self.invalidate()
+        return added
+
+    def remove( self, item_id: int ) -> None:
+        self.store.remove( item_id )
+        self.invalidate()
+
+    def set_many( self, quantities: dict ) -> None:
+        self.store.set_many( quantities )
+        self.invalidate()
+
+    def clear( self ) -> None:
+        self.store.clear()
+        self.invalidate()
+
+    def invalidate( self ) -> None:
+        super().invalidate()
+        self.__dict__.pop( 'pricing', None )
+        self.__dict__.pop( 'summary', None )
+
+
+def get_request_cart( request ) -> RequestCart:
+    if not hasattr( request, 'cart' ):
+        request.cart = RequestCart( request )
+    return request.cart
+
+
+class CartMiddleware:
+    def __init__( self, get_response ):
+        self.get_response = get_response
+
+    def __call__( self, request ):
+        request.cart = RequestCart( request )
+        return self.get_response( request )
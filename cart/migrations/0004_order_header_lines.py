@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_merge_20260327_1112'),
+        ('main', '0004_shaurma_is_featured_alter_shaurma_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHeader',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(blank=True, max_length=40, null=True, verbose_name='Ключ сессии')),
+                ('order_code', models.CharField(max_length=20, unique=True, verbose_name='Код заказа')),
+                ('subtotal', models.PositiveIntegerField(default=0, verbose_name='Сумма заказа без скидки')),
+                ('discount', models.PositiveIntegerField(default=0, verbose_name='Скидка по заказу')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Итог по заказу')),
+                ('payer_name', models.CharField(default='Galactical Bank Inc.', max_length=128, verbose_name='Счёт списания')),
+                ('is_demo_payment', models.BooleanField(default=True, verbose_name='Учебный платеж')),
+                ('date', models.DateTimeField(auto_now_add=True, verbose_name='Дата заказа')),
+                ('promocode', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cart.promocode', verbose_name='Промокод')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'заказ',
+                'verbose_name_plural': 'заказы',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveSmallIntegerField(default=1, verbose_name='Количество')),
+                ('unit_price', models.PositiveIntegerField(default=0, verbose_name='Цена за штуку')),
+                ('line_subtotal', models.PositiveIntegerField(default=0, verbose_name='Сумма без скидки')),
+                ('line_discount', models.PositiveIntegerField(default=0, verbose_name='Скидка по позиции')),
+                ('line_total', models.PositiveIntegerField(default=0, verbose_name='Сумма по позиции')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='cart.orderheader', verbose_name='Заказ')),
+                ('shaurma', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='main.shaurma', verbose_name='Шаурма')),
+            ],
+            options={
+                'verbose_name': 'позиция заказа',
+                'verbose_name_plural': 'позиции заказов',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderheader',
+            index=models.Index(fields=['user', '-date'], name='order_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+
+def forwards(apps, schema_editor):
+    Order = apps.get_model('cart', 'Order')
+    OrderHeader = apps.get_model('cart', 'OrderHeader')
+    OrderLine = apps.get_model('cart', 'OrderLine')
+
+    headers = {}
+    lines = []
+
+    for row in Order.objects.order_by('id').iterator(chunk_size=2000):
+        # Старые строки без кода заказа получили общий 'ORD-LEGACY' — разводим их по одной
+        key = f'ORD-LEGACY-{row.id}' if row.order_code == 'ORD-LEGACY' else row.order_code
+
+        if key not in headers:
+            headers[key] = OrderHeader(
+                user_id=row.user_id,
+                session_key=row.session_key,
+                order_code=key,
+                promocode_id=row.promocode_id,
+                subtotal=row.order_subtotal,
+                discount=row.order_discount,
+                total=row.order_total,
+                payer_name=row.payer_name,
+                is_demo_payment=row.is_demo_payment,
+            )
+            headers[key]._date = row.date
+
+        lines.append((key, OrderLine(
+            shaurma_id=row.shaurma_id,
+            quantity=row.quantity,
+            unit_price=row.unit_price,
+            line_subtotal=row.line_subtotal,
+            line_discount=row.line_discount,
+            line_total=row.line_total,
+        )))
+
+    OrderHeader.objects.bulk_create(headers.values(), batch_size=500)
+
+    # auto_now_add перезаписывает дату при вставке — возвращаем исходную
+    for header in headers.values():
+        header.date = header._date
+    OrderHeader.objects.bulk_update(headers.values(), ['date'], batch_size=500)
+
+    for key, line in lines:
+        line.order_id = headers[key].id
+    OrderLine.objects.bulk_create([line for _, line in lines], batch_size=500)
+
+
+def backwards(apps, schema_editor):
+    Order = apps.get_model('cart', 'Order')
+    OrderLine = apps.get_model('cart', 'OrderLine')
+
+    Order.objects.bulk_create([
+        Order(
+            user_id=line.order.user_id,
+            session_key=line.order.session_key,
+            shaurma_id=line.shaurma_id,
+            quantity=line.quantity,
+            unit_price=line.unit_price,
+            line_subtotal=line.line_subtotal,
+            line_discount=line.line_discount,
+            line_total=line.line_total,
+            order_code=line.order.order_code,
+            promocode_id=line.order.promocode_id,
+            order_subtotal=line.order.subtotal,
+            order_discount=line.order.discount,
+            order_total=line.order.total,
+            payer_name=line.order.payer_name,
+            is_demo_payment=line.order.is_demo_payment,
+        )
+        for line in OrderLine.objects.select_related('order').iterator(chunk_size=2000)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_order_header_lines'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
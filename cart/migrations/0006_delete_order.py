@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_move_orders_to_header_lines'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Order',
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+def fill_summaries(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    CartSummary = apps.get_model('cart', 'CartSummary')
+
+    rows = (
+        Cart.objects
+        .values('user_id', 'session_key')
+        .annotate(
+            item_count=models.Sum('quanity'),
+            subtotal=models.Sum(models.F('quanity') * models.F('item__price'), output_field=models.PositiveIntegerField()),
+        )
+        .order_by()
+    )
+
+    CartSummary.objects.bulk_create([
+        CartSummary(
+            owner_key=f'u:{row["user_id"]}' if row['user_id'] else f's:{row["session_key"]}',
+            item_count=row['item_count'],
+            subtotal=row['subtotal'],
+        )
+        for row in rows
+    ], batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0006_delete_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartSummary',
+            fields=[
+                ('owner_key', models.CharField(max_length=48, primary_key=True, serialize=False, verbose_name='Владелец корзины')),
+                ('item_count', models.PositiveIntegerField(default=0, verbose_name='Товаров в корзине')),
+                ('subtotal', models.PositiveIntegerField(default=0, verbose_name='Сумма без скидки')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='Версия корзины')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'итоги корзины',
+                'verbose_name_plural': 'итоги корзин',
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
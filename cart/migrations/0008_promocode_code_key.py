@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+def fill_code_key(apps, schema_editor):
+    Promocode = apps.get_model('cart', 'Promocode')
+
+    promocodes = list(Promocode.objects.all())
+    for promo in promocodes:
+        promo.code_key = promo.code_name.strip().casefold()
+    Promocode.objects.bulk_update(promocodes, ['code_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0007_cart_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promocode',
+            name='code_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=20, verbose_name='Промокод ( нормализованный )'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_code_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='promocode',
+            index=models.Index(fields=['date_add', 'date_end'], name='promocode_validity_idx'),
+        ),
+    ]
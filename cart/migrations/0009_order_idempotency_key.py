@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0008_promocode_code_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderheader',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='Токен оформления'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:35
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_stats(apps, schema_editor):
+    OrderLine = apps.get_model('cart', 'OrderLine')
+    ShaurmaStats = apps.get_model('cart', 'ShaurmaStats')
+
+    now = timezone.now()
+    rows = (
+        OrderLine.objects
+        .values('shaurma_id')
+        .annotate(
+            order_count=models.Count('id'),
+            units_sold=models.Sum('quantity'),
+            revenue=models.Sum('line_total'),
+            last_ordered_at=models.Max('order__date'),
+            units_7d=models.Sum('quantity', filter=models.Q(order__date__gte=now - timedelta(days=7)), default=0),
+            units_30d=models.Sum('quantity', filter=models.Q(order__date__gte=now - timedelta(days=30)), default=0),
+        )
+        .order_by()
+    )
+
+    ShaurmaStats.objects.bulk_create([ShaurmaStats(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0009_order_idempotency_key'),
+        ('main', '0004_shaurma_is_featured_alter_shaurma_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShaurmaStats',
+            fields=[
+                ('shaurma', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main.shaurma', verbose_name='Шаурма')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('units_sold', models.PositiveIntegerField(default=0, verbose_name='Продано штук')),
+                ('revenue', models.PositiveBigIntegerField(default=0, verbose_name='Выручка')),
+                ('units_7d', models.PositiveIntegerField(default=0, verbose_name='Продано за 7 дней')),
+                ('units_30d', models.PositiveIntegerField(default=0, verbose_name='Продано за 30 дней')),
+                ('last_ordered_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний заказ')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'популярность шаурмы',
+                'verbose_name_plural': 'популярность шаурмы',
+                'indexes': [models.Index(fields=['-order_count'], name='shaurma_stats_orders_idx')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
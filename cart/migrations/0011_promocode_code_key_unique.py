@@ -0,0 +1,42 @@
+# Generated by Django 6.1.2 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+def check_code_key_duplicates(apps, schema_editor):
+    # Промокоды на руках у клиентов: переименовать дубли нельзя, их разбирают вручную до миграции
+    Promocode = apps.get_model('cart', 'Promocode')
+
+    duplicates = (
+        Promocode.objects.values('code_key')
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+        .values_list('code_key', flat=True)
+    )
+    conflicts = {}
+    for promo_id, code_key, code_name in (
+        Promocode.objects.filter(code_key__in=duplicates).order_by('code_key', 'id').values_list('id', 'code_key', 'code_name')
+    ):
+        conflicts.setdefault(code_key, []).append(f'{code_name} (id={promo_id})')
+
+    if conflicts:
+        raise RuntimeError(
+            'Промокоды совпадают без учёта регистра, исправьте или удалите лишние вручную: '
+            + '; '.join(', '.join(codes) for codes in conflicts.values())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0010_shaurma_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_code_key_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='promocode',
+            name='code_key',
+            field=models.CharField(editable=False, max_length=20, unique=True, verbose_name='Промокод ( нормализованный )'),
+        ),
+    ]
@@ -1,26 +1,24 @@
 import uuid
+from datetime import timedelta
 
+from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db import models as m
+from django.db import IntegrityError, models as m, transaction
+from django.db.models.functions import Cast, Coalesce, Least, Substr
 
 
-class Order( m.Model ):
-    user              = m.ForeignKey( 'main.User', on_delete = m.SET_NULL, null = True, blank = True, verbose_name = 'Пользователь' )
+class OrderHeader( m.Model ):
+    user              = m.ForeignKey( 'main.User', on_delete = m.SET_NULL, null = True, blank = True, related_name = 'orders', verbose_name = 'Пользователь' )
     session_key       = m.CharField( max_length = 40, null = True, blank = True, verbose_name = 'Ключ сессии' )
-    shaurma           = m.ForeignKey( 'main.Shaurma', on_delete = m.PROTECT, verbose_name = 'Шаурма' )
-    quantity          = m.PositiveSmallIntegerField( default = 1, verbose_name = 'Количество' )
-    unit_price        = m.PositiveIntegerField( default = 0, verbose_name = 'Цена за штуку' )
-    line_subtotal     = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма без скидки' )
-    line_discount     = m.PositiveIntegerField( default = 0, verbose_name = 'Скидка по позиции' )
-    line_total        = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма по позиции' )
-    order_code        = m.CharField( max_length = 20, db_index = True, verbose_name = 'Код заказа' )
+    order_code        = m.CharField( max_length = 20, unique = True, verbose_name = 'Код заказа' )
+    idempotency_key   = m.UUIDField( null = True, blank = True, unique = True, editable = False, verbose_name = 'Токен оформления' )
     promocode         = m.ForeignKey( 'cart.Promocode', on_delete = m.SET_NULL, null = True, blank = True, verbose_name = 'Промокод' )
-    order_subtotal    = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма заказа без скидки' )
-    order_discount    = m.PositiveIntegerField( default = 0, verbose_name = 'Скидка по заказу' )
-    order_total       = m.PositiveIntegerField( default = 0, verbose_name = 'Итог по заказу' )
+    subtotal          = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма заказа без скидки' )
+    discount          = m.PositiveIntegerField( default = 0, verbose_name = 'Скидка по заказу' )
+    total             = m.PositiveIntegerField( default = 0, verbose_name = 'Итог по заказу' )
     payer_name        = m.CharField( max_length = 128, default = 'Galactical Bank Inc.', verbose_name = 'Счёт списания' )
     is_demo_payment   = m.BooleanField( default = True, verbose_name = 'Учебный платеж' )
-    date              = m.DateTimeField( auto_now_add = True )
+    date              = m.DateTimeField( auto_now_add = True, verbose_name = 'Дата заказа' )
 
     def __str__(self):
         return f'Заказ {self.order_code}'
@@ -28,6 +26,197 @@ class Order( m.Model ):
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        ordering = [ '-date' ]
+        indexes = [
+            m.Index( fields = [ 'user', '-date' ], name = 'order_user_date_idx' ),
+        ]
+
+
+class OrderLine( m.Model ):
+    order             = m.ForeignKey( OrderHeader, on_delete = m.CASCADE, related_name = 'lines', verbose_name = 'Заказ' )
+    shaurma           = m.ForeignKey( 'main.Shaurma', on_delete = m.PROTECT, verbose_name = 'Шаурма' )
+    quantity          = m.PositiveSmallIntegerField( default = 1, verbose_name = 'Количество' )
+    unit_price        = m.PositiveIntegerField( default = 0, verbose_name = 'Цена за штуку' )
+    line_subtotal     = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма без скидки' )
+    line_discount     = m.PositiveIntegerField( default = 0, verbose_name = 'Скидка по позиции' )
+    line_total        = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма по позиции' )
+
+    def __str__(self):
+        return f'{self.shaurma_id} × {self.quantity} ( {self.order_id} )'
+
+    class Meta:
+        verbose_name = 'позиция заказа'
+        verbose_name_plural = 'позиции заказов'
+        ordering = [ 'id' ]
+
+
+class ShaurmaStatsManager( m.Manager ):
+    WINDOWS = { 'units_7d': 7, 'units_30d': 30 }
+
+    def _invalidate_index( self ) -> None:
+        """UPDATE / bulk_create не шлют сигналов — версию фрагмента главной меняем сами, после коммита."""
+        # main.page_cache импортирует эту модель
+        from main.page_cache import bump_version
+        transaction.on_commit( lambda: bump_version( self.model ) )
+
+    def record_order( self, lines ) -> None:
+        """
+        Добавляет позиции оформленного заказа к счётчикам ( в транзакции оформления ).
+        Два запроса при любом числе позиций: недостающие строки, затем один UPDATE с приращениями.
+        """
+        lines = { line.shaurma_id: line for line in lines }
+        if not lines:
+            return
+
+        self.bulk_create( [ self.model( shaurma_id = pk ) for pk in lines ], ignore_conflicts = True )
+
+        def per_line( attr ):
+            return m.Case(
+                *( m.When( shaurma_id = pk, then = m.Value( getattr( line, attr ) ) ) for pk, line in lines.items() ),
+                default = m.Value( 0 ),
+                output_field = m.PositiveIntegerField(),
+            )
+
+        now = timezone.now()
+        quantity = per_line( 'quantity' )
+        self.filter( shaurma_id__in = lines ).update(
+            order_count     = m.F( 'order_count' ) + 1,
+            units_sold      = m.F( 'units_sold' ) + quantity,
+            revenue         = m.F( 'revenue' ) + per_line( 'line_total' ),
+            **{ field: m.F( field ) + quantity for field in self.WINDOWS },
+            last_ordered_at = now,
+            updated_at      = now,
+        )
+        self._invalidate_index()
+
+    @transaction.atomic
+    def rollup( self ) -> int:
+        """
+        Пересчитывает таблицу по всем позициям заказов одним агрегатом: сдвигает окна 7/30 дней
+        и исправляет расхождения инкрементальных счётчиков. Возвращает число товаров со статистикой.
+        """
+        now = timezone.now()
+        rows = OrderLine.objects.values( 'shaurma' ).annotate(
+            order_count     = m.Count( 'id' ),
+            units_sold      = m.Sum( 'quantity' ),
+            revenue         = m.Sum( 'line_total' ),
+            last_ordered_at = m.Max( 'order__date' ),
+            **{
+                field: m.Sum( 'quantity', filter = m.Q( order__date__gte = now - timedelta( days = days ) ), default = 0 )
+                for field, days in self.WINDOWS.items()
+            },
+        ).order_by()
+        stats = [ self.model( shaurma_id = row.pop( 'shaurma' ), updated_at = now, **row ) for row in rows ]
+
+        self.exclude( shaurma_id__in = [ item.shaurma_id for item in stats ] ).delete()
+        self.bulk_create(
+            stats,
+            update_conflicts = True,
+            unique_fields = [ 'shaurma' ],
+            update_fields = [ 'order_count', 'units_sold', 'revenue', 'last_ordered_at', 'updated_at', *self.WINDOWS ],
+        )
+        self._invalidate_index()
+        return len( stats )
+
+
+class ShaurmaStats( m.Model ):
+    """
+    Популярность товара по оформленным заказам: главная читает готовый топ по индексу
+    вместо агрегата по всем позициям заказов. Счётчики растут при оформлении,
+    окна 7/30 дней сдвигает команда rollup_shaurma_stats.
+    """
+    shaurma         = m.OneToOneField( 'main.Shaurma', on_delete = m.CASCADE, primary_key = True, related_name = 'stats', verbose_name = 'Шаурма' )
+    order_count     = m.PositiveIntegerField( default = 0, verbose_name = 'Заказов' )
+    units_sold      = m.PositiveIntegerField( default = 0, verbose_name = 'Продано штук' )
+    revenue         = m.PositiveBigIntegerField( default = 0, verbose_name = 'Выручка' )
+    units_7d        = m.PositiveIntegerField( default = 0, verbose_name = 'Продано за 7 дней' )
+    units_30d       = m.PositiveIntegerField( default = 0, verbose_name = 'Продано за 30 дней' )
+    last_ordered_at = m.DateTimeField( null = True, blank = True, verbose_name = 'Последний заказ' )
+    updated_at      = m.DateTimeField( auto_now = True, verbose_name = 'Обновлено' )
+
+    objects = ShaurmaStatsManager()
+
+    def __str__(self):
+        return f'{self.shaurma_id}: {self.order_count} заказов / {self.units_sold} шт.'
+
+    class Meta:
+        verbose_name = 'популярность шаурмы'
+        verbose_name_plural = 'популярность шаурмы'
+        indexes = [
+            m.Index( fields = [ '-order_count' ], name = 'shaurma_stats_orders_idx' ),
+        ]
+
+
+class CartManager( m.Manager ):
+    MAX_QUANTITY = 99
+
+    def _owner_unique_fields( self, owner: dict ) -> list:
+        return [ 'user', 'item' ] if 'user' in owner else [ 'session_key', 'item' ]
+
+    @transaction.atomic
+    def add_item( self, owner: dict, item_id: int, delta: int = 1 ) -> bool:
+        """
+        Атомарно увеличивает количество позиции (UPDATE ... SET quanity = quanity + delta),
+        не больше MAX_QUANTITY; при отсутствии строки создаёт её. Возвращает False, если товара не существует.
+        """
+        rows = self.filter( item_id = item_id, **owner )
+        quantity = Least( m.F( 'quanity' ) + delta, self.MAX_QUANTITY )
+        if rows.update( quanity = quantity, updated_at = timezone.now() ):
+            CartSummary.objects.refresh( owner )
+            return True
+
+        item_model = self.model._meta.get_field( 'item' ).related_model
+        if not item_model.objects.filter( id = item_id ).exists():
+            return False
+
+        try:
+            with transaction.atomic():
+                self.create( item_id = item_id, quanity = min( delta, self.MAX_QUANTITY ), **owner )
+        except IntegrityError:
+            # Параллельный запрос успел создать строку — просто увеличиваем её
+            rows.update( quanity = quantity, updated_at = timezone.now() )
+
+        CartSummary.objects.refresh( owner )
+        return True
+
+    @transaction.atomic
+    def remove_item( self, owner: dict, item_id: int ) -> None:
+        """Атомарно уменьшает количество позиции, последняя штука удаляет строку."""
+        rows = self.filter( item_id = item_id, **owner )
+        if not rows.filter( quanity__gt = 1 ).update( quanity = m.F( 'quanity' ) - 1, updated_at = timezone.now() ):
+            rows.delete()
+        CartSummary.objects.refresh( owner )
+
+    @transaction.atomic
+    def clear( self, owner: dict ) -> None:
+        self.filter( **owner ).delete()
+        CartSummary.objects.refresh( owner )
+
+    @transaction.atomic
+    def set_quantities( self, owner: dict, quantities: dict ) -> None:
+        """
+        Выставляет количества сразу для нескольких позиций одним upsert'ом.
+        Количество 0 удаляет позицию, несуществующие товары пропускаются.
+        """
+        quantities = { item_id: min( qty, self.MAX_QUANTITY ) for item_id, qty in quantities.items() }
+
+        to_delete = [ item_id for item_id, qty in quantities.items() if qty <= 0 ]
+        if to_delete:
+            self.filter( item_id__in = to_delete, **owner ).delete()
+
+        item_model = self.model._meta.get_field( 'item' ).related_model
+        existing = item_model.objects.filter(
+            id__in = [ item_id for item_id, qty in quantities.items() if qty > 0 ]
+        ).values_list( 'id', flat = True )
+
+        now = timezone.now()
+        self.bulk_create(
+            [ self.model( item_id = item_id, quanity = quantities[item_id], updated_at = now, **owner ) for item_id in existing ],
+            update_conflicts = True,
+            unique_fields    = self._owner_unique_fields( owner ),
+            update_fields    = [ 'quanity', 'updated_at' ],
+        )
+        CartSummary.objects.refresh( owner )
 
 
 class Cart( m.Model ):
@@ -39,6 +228,8 @@ class Cart( m.Model ):
     created_at  = m.DateTimeField( auto_now_add = True, verbose_name = 'Добавлено' )
     updated_at  = m.DateTimeField( auto_now = True, verbose_name = 'Обновлено' )
 
+    objects = CartManager()
+
     class Meta:
         verbose_name = 'корзина'
         verbose_name_plural = 'корзины'
@@ -49,17 +240,121 @@ class Cart( m.Model ):
         ]
 
 
+class CartSummaryManager( m.Manager ):
+    def refresh( self, owner: dict ) -> None:
+        """Пересчитывает итоги корзины владельца и увеличивает версию (в транзакции изменения)."""
+        totals = Cart.objects.filter( **owner ).aggregate(
+            item_count = m.Sum( 'quanity' ),
+            subtotal   = m.Sum( m.F( 'quanity' ) * m.F( 'item__price' ), output_field = m.PositiveIntegerField() ),
+        )
+        key = self.model.key_for( owner )
+        values = {
+            'item_count': totals['item_count'] or 0,
+            'subtotal'  : totals['subtotal'] or 0,
+            'updated_at': timezone.now(),
+        }
+
+        if self.filter( pk = key ).update( version = m.F( 'version' ) + 1, **values ):
+            return
+
+        try:
+            with transaction.atomic():
+                self.create( owner_key = key, **values )
+        except IntegrityError:
+            self.filter( pk = key ).update( version = m.F( 'version' ) + 1, **values )
+
+    def owner_keys( self, carts ) -> set:
+        """Ключи владельцев строк корзины из queryset Cart — один запрос."""
+        return {
+            self.model.key_for( { 'user_id': user_id } if user_id else { 'session_key': session_key } )
+            for user_id, session_key in carts.values_list( 'user_id', 'session_key' ).distinct()
+        }
+
+    def refresh_many( self, keys ) -> None:
+        """
+        Пересчитывает итоги нескольких владельцев без цикла по ним: один UPDATE с подзапросами
+        для пользователей и один для сессий. Строки, которых ещё нет, не создаются.
+        """
+        keys = set( keys )
+        now = timezone.now()
+        owners = (
+            ( 'u:', 'user_id', Cast( Substr( m.OuterRef( 'owner_key' ), 3 ), m.IntegerField() ) ),
+            ( 's:', 'session_key', Substr( m.OuterRef( 'owner_key' ), 3 ) ),
+        )
+        for prefix, field, owner_value in owners:
+            selected = [ key for key in keys if key.startswith( prefix ) ]
+            if not selected:
+                continue
+
+            carts = Cart.objects.filter( **{ field: owner_value } ).order_by().values( field )
+
+            def total( expression ):
+                return Coalesce(
+                    m.Subquery( carts.annotate( value = m.Sum( expression ) ).values( 'value' ) ),
+                    0,
+                    output_field = m.PositiveIntegerField(),
+                )
+
+            self.filter( pk__in = selected ).update(
+                item_count = total( 'quanity' ),
+                subtotal   = total( m.F( 'quanity' ) * m.F( 'item__price' ) ),
+                version    = m.F( 'version' ) + 1,
+                updated_at = now,
+            )
+
+
+class CartSummary( m.Model ):
+    """
+    Итоги корзины владельца: счётчик для шапки читается одним запросом по первичному ключу,
+    версия меняется при каждом изменении корзины.
+    """
+    owner_key  = m.CharField( max_length = 48, primary_key = True, verbose_name = 'Владелец корзины' )
+    item_count = m.PositiveIntegerField( default = 0, verbose_name = 'Товаров в корзине' )
+    subtotal   = m.PositiveIntegerField( default = 0, verbose_name = 'Сумма без скидки' )
+    version    = m.PositiveIntegerField( default = 1, verbose_name = 'Версия корзины' )
+    updated_at = m.DateTimeField( auto_now = True, verbose_name = 'Обновлено' )
+
+    objects = CartSummaryManager()
+
+    @staticmethod
+    def key_for( owner: dict ) -> str:
+        if 'user' in owner:
+            return f'u:{owner["user"].pk}'
+        if 'user_id' in owner:
+            return f'u:{owner["user_id"]}'
+        return f's:{owner["session_key"]}'
+
+    def __str__(self):
+        return f'{self.owner_key}: {self.item_count} шт. / {self.subtotal}₽ ( v{self.version} )'
+
+    class Meta:
+        verbose_name = 'итоги корзины'
+        verbose_name_plural = 'итоги корзин'
+
+
 class Promocode( m.Model ):
     code_name = m.CharField( max_length = 20, unique = True, verbose_name = 'Промокод' )
+    code_key  = m.CharField( max_length = 20, unique = True, editable = False, verbose_name = 'Промокод ( нормализованный )' )
     code_uuid = m.UUIDField( default=uuid.uuid4, editable=False, verbose_name = 'Промокод UUID' )
     duration  = m.SmallIntegerField( default = 7, verbose_name = 'Время жизни ( в днях )' )
     discount  = m.SmallIntegerField( default = 5, verbose_name = 'Скидка в %' )
     date_add  = m.DateField( verbose_name = 'Дата создания' )
     date_end  = m.DateField( null = True, blank = True, editable=False, verbose_name = 'Дата конца' )
 
+    @staticmethod
+    def normalize( code: str ) -> str:
+        return code.strip().casefold()
+
+    def clean( self ):
+        super().clean()
+        # code_key не редактируется в форме, поэтому совпадение без учёта регистра проверяем здесь
+        if self.code_name and Promocode.objects.filter( code_key = self.normalize( self.code_name ) ).exclude( pk = self.pk ).exists():
+            raise ValidationError( { 'code_name': 'Промокод с таким названием без учёта регистра уже существует.' } )
+
     def save( self, *args, **kwargs ):
         if not self.id:
             self.date_end = self.date_add + timezone.timedelta( days = self.duration )
+        self.code_key = self.normalize( self.code_name )
 
         super().save( *args, **kwargs )
 
@@ -70,3 +365,6 @@ class Promocode( m.Model ):
         verbose_name = 'промокод'
         verbose_name_plural = 'промокоды'
         ordering = [ '-date_end' ]
+        indexes = [
+            m.Index( fields = [ 'date_add', 'date_end' ], name = 'promocode_validity_idx' ),
+        ]
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+from cart.models import Promocode
+from cart.promocodes import active_promocodes
+from cart.stores import get_cart_store
+from main.models import Shaurma
+
+
+@dataclass( frozen = True, slots = True )
+class CartLine:
+    """Позиция корзины с посчитанными суммами."""
+    shaurma       : Shaurma
+    quantity      : int
+    unit_price    : int
+    line_subtotal : int
+    line_discount : int
+    line_total    : int
+
+    @property
+    def total( self ) -> int:
+        return self.line_subtotal
+
+    def as_dict( self ) -> dict:
+        sh = self.shaurma
+        return {
+            'id'      : sh.id,
+            'name'    : sh.name,
+            'slug'    : sh.slug,
+            'price'   : self.unit_price,
+            'quantity': self.quantity,
+            'total'   : self.line_subtotal,
+            'picture' : sh.picture.url if sh.picture else None,
+        }
+
+    def as_compact_dict( self ) -> dict:
+        return { 'id': self.shaurma.id, 'quantity': self.quantity, 'total': self.line_subtotal }
+
+
+@dataclass( frozen = True, slots = True )
+class CartPricing:
+    """Неизменяемый итог расчёта корзины."""
+    lines            : tuple
+    subtotal         : int = 0
+    discount         : int = 0
+    discount_percent : int = 0
+    total            : int = 0
+    count            : int = 0
+    promo            : Promocode | None = None
+    promo_code       : str = ''
+
+    @property
+    def is_empty( self ) -> bool:
+        return not self.lines
+
+    @property
+    def quantities( self ) -> dict:
+        return { line.shaurma.id: line.quantity for line in self.lines }
+
+    def as_dict( self ) -> dict:
+        return {
+            'items': [ line.as_dict() for line in self.lines ],
+            'total': self.subtotal,
+            'count': self.count,
+        }
+
+
+class CartPricer:
+    """
+    Единый расчёт корзины для страницы корзины, checkout, AJAX и контекст-процессора.
+    Все позиции вместе с товарами читаются одним запросом из хранилища корзины
+    и запоминаются до вызова invalidate().
+    """
+    def __init__( self, request ):
+        self.request = request
+
+    @property
+    def store( self ):
+        return get_cart_store( self.request )
+
+    @cached_property
+    def lines( self ) -> list:
+        return self.store.lines()
+
+    def invalidate( self ) -> None:
+        self.__dict__.pop( 'lines', None )
+
+    @staticmethod
+    def find_promo( promo_code: str ) -> Promocode | None:
+        return active_promocodes.get( promo_code )
+
+    def price( self, promo_code: str = '' ) -> CartPricing:
+        promo = self.find_promo( promo_code )
+        discount_percent = max( 0, min( int( promo.discount ), 100 ) ) if promo else 0
+
+        return self.build( self.lines, promo, discount_percent, promo_code or '' )
+
+    @staticmethod
+    def build( entries, promo = None, discount_percent: int = 0, promo_code: str = '' ) -> CartPricing:
+        lines = []
+        subtotal = 0
+        count = 0
+
+        for sh, q in entries:
+            line_subtotal = sh.price * q
+            line_discount = round( line_subtotal * ( discount_percent / 100 ) )
+            lines.append( CartLine(
+                shaurma       = sh,
+                quantity      = q,
+                unit_price    = sh.price,
+                line_subtotal = line_subtotal,
+                line_discount = line_discount,
+                line_total    = line_subtotal - line_discount,
+            ) )
+            subtotal += line_subtotal
+            count += q
+
+        discount = round( subtotal * ( discount_percent / 100 ) )
+
+        return CartPricing(
+            lines            = tuple( lines ),
+            subtotal         = subtotal,
+            discount         = discount,
+            discount_percent = discount_percent,
+            total            = subtotal - discount,
+            count            = count,
+            promo            = promo,
+            promo_code       = promo_code,
+        )
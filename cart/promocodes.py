@@ -0,0 +1,54 @@
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from cart.models import Promocode
+
+
+class ActivePromocodes:
+    """
+    Кэш действующих промокодов в памяти процесса: { нормализованный код: Promocode }.
+    Перечитывается одним запросом по истечении TTL, при смене даты
+    и после сохранения / удаления любого промокода (сигналы в cart.signals).
+    """
+
+    def __init__( self, ttl: int ):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._codes = None
+        self._loaded_at = 0.0
+        self._loaded_for = None
+
+    def _is_stale( self, today ) -> bool:
+        return (
+            self._codes is None
+            or self._loaded_for != today
+            or time.monotonic() - self._loaded_at > self.ttl
+        )
+
+    def _load( self, today ) -> dict:
+        promos = Promocode.objects.filter( date_add__lte = today, date_end__gte = today )
+        return { promo.code_key: promo for promo in promos }
+
+    def get( self, code: str ) -> Promocode | None:
+        if not code:
+            return None
+
+        today = timezone.now().date()
+        with self._lock:
+            if self._is_stale( today ):
+                self._codes = self._load( today )
+                self._loaded_at = time.monotonic()
+                self._loaded_for = today
+            codes = self._codes
+
+        return codes.get( Promocode.normalize( code ) )
+
+    def invalidate( self ) -> None:
+        with self._lock:
+            self._codes = None
+
+
+active_promocodes = ActivePromocodes( ttl = settings.PROMOCODE_CACHE_TTL )
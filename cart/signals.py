@@ -0,0 +1,48 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from cart.models import Cart, CartSummary, Promocode
+from cart.promocodes import active_promocodes
+from cart.stores import merge_session_cart
+from main.models import Shaurma
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_session_cart(request, user)
+
+
+@receiver(post_init, sender=Shaurma)
+def remember_price(sender, instance, **kwargs):
+    # Без запроса: у отложенного поля цены нет — тогда изменение считается возможным
+    instance._cart_loaded_price = instance.__dict__.get('price')
+
+
+@receiver(post_save, sender=Shaurma)
+def refresh_cart_summaries(sender, instance, created, **kwargs):
+    # Итоги корзин зависят только от цены: остальные правки товара их не трогают
+    price = instance.__dict__.get('price')
+    if created or (price is not None and price == instance._cart_loaded_price):
+        return
+    instance._cart_loaded_price = price
+
+    CartSummary.objects.refresh_many(CartSummary.objects.owner_keys(Cart.objects.filter(item=instance)))
+
+
+@receiver(pre_delete, sender=Shaurma)
+def remember_cart_owners(sender, instance, **kwargs):
+    # Строки Cart удалятся каскадом — владельцев запоминаем до удаления
+    instance._cart_owner_keys = CartSummary.objects.owner_keys(Cart.objects.filter(item=instance))
+
+
+@receiver(post_delete, sender=Shaurma)
+def refresh_cart_summaries_on_delete(sender, instance, **kwargs):
+    CartSummary.objects.refresh_many(getattr(instance, '_cart_owner_keys', ()))
+
+
+@receiver(post_save, sender=Promocode)
+@receiver(post_delete, sender=Promocode)
+def invalidate_promocodes(sender, **kwargs):
+    active_promocodes.invalidate()
@@ -0,0 +1,178 @@
+from functools import cached_property
+
+from django.conf import settings
+
+from cart.models import Cart, CartSummary
+from cart.utils import get_cart_owner
+from main.models import Shaurma
+from main.page_cache import model_versions
+
+
+ITEM_FIELDS = ( 'id', 'name', 'slug', 'price', 'picture' )
+
+
+class CartTotals:
+    """Итоги корзины для шапки и API. Сумма может быть функцией — тогда считается при первом обращении."""
+
+    def __init__( self, count: int, total, version: int ):
+        self.count = count
+        self.version = version
+        self._total = total
+
+    @cached_property
+    def total( self ) -> int:
+        return self._total() if callable( self._total ) else self._total
+
+
+class DbCartStore:
+    """Корзина в таблице Cart (пользователь или ключ сессии)."""
+
+    def __init__( self, request ):
+        self.request = request
+
+    def _owner( self, create: bool = True ) -> dict | None:
+        if not create and not self.request.user.is_authenticated and not self.request.session.session_key:
+            return None
+        return get_cart_owner( self.request )
+
+    def lines( self ) -> list[tuple[Shaurma, int]]:
+        owner = self._owner( create = False )
+        if owner is None:
+            return []
+
+        entries = (
+            Cart.objects
+            .filter( **owner )
+            .select_related( 'item' )
+            .only( 'quanity', *( f'item__{field}' for field in ITEM_FIELDS ) )
+        )
+        return [ ( entry.item, entry.quanity ) for entry in entries ]
+
+    def add( self, item_id: int ) -> bool:
+        return Cart.objects.add_item( self._owner(), item_id )
+
+    def remove( self, item_id: int ) -> None:
+        owner = self._owner( create = False )
+        if owner is not None:
+            Cart.objects.remove_item( owner, item_id )
+
+    def set_many( self, quantities: dict ) -> None:
+        Cart.objects.set_quantities( self._owner(), quantities )
+
+    def clear( self ) -> None:
+        owner = self._owner( create = False )
+        if owner is not None:
+            Cart.objects.clear( owner )
+
+    def summary( self ) -> CartTotals:
+        """Количество товаров, сумма и версия — одно чтение CartSummary по первичному ключу."""
+        owner = self._owner( create = False )
+        if owner is None:
+            return CartTotals( 0, 0, 0 )
+
+        row = (
+            CartSummary.objects
+            .filter( pk = CartSummary.key_for( owner ) )
+            .values_list( 'item_count', 'subtotal', 'version' )
+            .first()
+        )
+        return CartTotals( *( row or ( 0, 0, 0 ) ) )
+
+    def etag_suffix( self ) -> str:
+        # Смена цены уже меняет версию CartSummary ( CartSummary.objects.refresh_many )
+        return ''
+
+
+class SessionCartStore:
+    """
+    Корзина анонимного посетителя целиком в сессии: { id товара: количество }.
+    Пока посетитель ничего не положил в корзину, сессия не создаётся и в БД ничего не пишется.
+    """
+    SESSION_KEY = 'cart'
+    VERSION_KEY = 'cart_version'
+
+    def __init__( self, request ):
+        self.request = request
+
+    @property
+    def quantities( self ) -> dict:
+        return { int( item_id ): qty for item_id, qty in self.request.session.get( self.SESSION_KEY, {} ).items() }
+
+    def _save( self, quantities: dict ) -> None:
+        self.request.session[ self.SESSION_KEY ] = {
+            str( item_id ): min( qty, Cart.objects.MAX_QUANTITY ) for item_id, qty in quantities.items() if qty > 0
+        }
+        self.request.session[ self.VERSION_KEY ] = self.request.session.get( self.VERSION_KEY, 0 ) + 1
+
+    def lines( self ) -> list[tuple[Shaurma, int]]:
+        quantities = self.quantities
+        if not quantities:
+            return []
+
+        items = Shaurma.objects.filter( id__in = quantities ).only( *ITEM_FIELDS ).in_bulk()
+        return [ ( items[ item_id ], qty ) for item_id, qty in quantities.items() if item_id in items ]
+
+    def add( self, item_id: int ) -> bool:
+        if not Shaurma.objects.filter( id = item_id ).exists():
+            return False
+
+        quantities = self.quantities
+        quantities[ item_id ] = quantities.get( item_id, 0 ) + 1
+        self._save( quantities )
+        return True
+
+    def remove( self, item_id: int ) -> None:
+        quantities = self.quantities
+        if item_id in quantities:
+            quantities[ item_id ] -= 1
+            self._save( quantities )
+
+    def set_many( self, quantities: dict ) -> None:
+        current = self.quantities
+        existing = set( Shaurma.objects.filter( id__in = quantities ).values_list( 'id', flat = True ) )
+        current.update( { item_id: qty for item_id, qty in quantities.items() if item_id in existing or qty <= 0 } )
+        self._save( current )
+
+    def clear( self ) -> None:
+        self._save( {} )
+
+    def _subtotal( self ) -> int:
+        quantities = self.quantities
+        if not quantities:
+            return 0
+        prices = Shaurma.objects.filter( id__in = quantities ).values_list( 'id', 'price' )
+        return sum( price * quantities[ item_id ] for item_id, price in prices )
+
+    def summary( self ) -> CartTotals:
+        """Количество и версия — из сессии без запросов, цены читаются только при обращении к сумме."""
+        return CartTotals(
+            sum( self.quantities.values() ),
+            self._subtotal,
+            self.request.session.get( self.VERSION_KEY, 0 ),
+        )
+
+    def etag_suffix( self ) -> str:
+        # Цены в сессии не хранятся: после смены цены версия корзины прежняя, меняется версия Shaurma
+        return f'-p{model_versions( Shaurma )}'
+
+
+def get_cart_store( request ):
+    if not request.user.is_authenticated and settings.CART_ANONYMOUS_STORE == 'session':
+        return SessionCartStore( request )
+    return DbCartStore( request )
+
+
+def merge_session_cart( request, user ) -> None:
+    """Переносит сессионную корзину в Cart пользователя одним upsert'ом, количества суммируются."""
+    quantities = SessionCartStore( request ).quantities
+    if not quantities:
+        return
+
+    existing = dict(
+        Cart.objects.filter( user = user, item_id__in = quantities ).values_list( 'item_id', 'quanity' )
+    )
+    Cart.objects.set_quantities(
+        { 'user': user },
+        { item_id: qty + existing.get( item_id, 0 ) for item_id, qty in quantities.items() },
+    )
+    request.session.pop( SessionCartStore.SESSION_KEY, None )
@@ -1,8 +1,25 @@
-from django.test import TestCase
+import threading
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from cart.models import Cart, Order, Promocode
+from cart.middleware import get_request_cart
+from cart.models import Cart, CartSummary, OrderHeader, OrderLine, Promocode, ShaurmaStats
+from cart.pricing import CartPricer
+from cart.promocodes import active_promocodes
 from main.factories import ShaurmaFactory, UserFactory
+from main.page_cache import page_versions
 from django.utils import timezone
 
 
@@ -64,7 +81,7 @@ class CheckoutFlowTest(TestCase):
 
     def test_checkout_confirm_creates_order_and_clears_cart(self):
         self.assertEqual(Cart.objects.count(), 1)
-        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(OrderHeader.objects.count(), 0)
 
         resp = self.client.post(reverse('checkout'), {
             'action': 'confirm',
@@ -76,16 +93,18 @@ class CheckoutFlowTest(TestCase):
 
         # корзина очищена
         self.assertEqual(Cart.objects.count(), 0)
-        # создан хотя бы один Order
-        self.assertGreaterEqual(Order.objects.count(), 1)
+        # создан один заказ с одной позицией
+        self.assertEqual(OrderHeader.objects.count(), 1)
+        self.assertEqual(OrderLine.objects.count(), 1)
 
-        order_row = Order.objects.first()
-        self.assertEqual(order_row.user, self.user)
-        self.assertEqual(order_row.unit_price, 200)
-        self.assertTrue(order_row.order_code)
-        self.assertTrue(order_row.is_demo_payment)
+        order = OrderHeader.objects.first()
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.lines.first().unit_price, 200)
+        self.assertTrue(order.order_code)
+        self.assertTrue(order.is_demo_payment)
 
     def test_checkout_with_valid_promocode_applies_discount(self):
+        active_promocodes.invalidate()
         promo = Promocode.objects.create(
             code_name='TEST10',
             date_add=timezone.now().date(),
@@ -104,10 +123,599 @@ class CheckoutFlowTest(TestCase):
         })
         self.assertEqual(resp2.status_code, 302)
 
-        order_row = Order.objects.first()
+        order = OrderHeader.objects.first()
         # Проверяем, что применяется скидка 10%
-        self.assertEqual(order_row.order_subtotal, 200)
-        self.assertEqual(order_row.order_discount, 20)
-        self.assertEqual(order_row.order_total, 180)
-        self.assertEqual(order_row.promocode, promo)
+        self.assertEqual(order.subtotal, 200)
+        self.assertEqual(order.discount, 20)
+        self.assertEqual(order.total, 180)
+        self.assertEqual(order.promocode, promo)
+
+    def test_profile_shows_order_history(self):
+        self.client.post(reverse('checkout'), {'action': 'confirm', 'promo_code': ''})
+        order = OrderHeader.objects.get()
+
+        resp = self.client.get(reverse('user', kwargs={'username': self.user.username}))
+        self.assertContains(resp, order.order_code)
+        self.assertContains(resp, self.item.name)
+
+    def test_checkout_queries_do_not_depend_on_lines(self):
+        def confirm():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(reverse('checkout'), {'action': 'confirm', 'promo_code': ''})
+            return len(ctx.captured_queries)
+
+        small = confirm()
+
+        for i in range(20):
+            Cart.objects.create(user=self.user, item=ShaurmaFactory(name=f'Позиция {i}', price=50), quanity=1)
+
+        self.assertEqual(confirm(), small)
+        self.assertEqual(OrderHeader.objects.count(), 2)
+        self.assertEqual(OrderHeader.objects.order_by('id').last().lines.count(), 20)
+
+
+class CartPricerTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+
+    def _fill_cart(self, size):
+        for i in range(size):
+            item = ShaurmaFactory(name=f'Шаурма {size}-{i}', price=100)
+            Cart.objects.create(user=self.user, item=item, quanity=2)
+
+    def test_pricing_totals_with_promocode(self):
+        active_promocodes.invalidate()
+        self._fill_cart(3)
+        Promocode.objects.create(code_name='PRICE10', date_add=timezone.now().date(), discount=10)
+        request = self.client.get(reverse('cart')).wsgi_request
+
+        pricing = CartPricer(request).price('price10')
+        self.assertEqual(len(pricing.lines), 3)
+        self.assertEqual(pricing.count, 6)
+        self.assertEqual(pricing.subtotal, 600)
+        self.assertEqual(pricing.discount, 60)
+        self.assertEqual(pricing.total, 540)
+        self.assertEqual(pricing.promo.code_name, 'PRICE10')
+
+    def test_cart_page_queries_do_not_depend_on_lines(self):
+        self._fill_cart(1)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('cart'))
+
+        self._fill_cart(30)
+        with CaptureQueriesContext(connection) as large:
+            resp = self.client.get(reverse('cart'))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class CartMutationTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.item = ShaurmaFactory(name='Классическая', price=100)
+        self.other = ShaurmaFactory(name='Сырная', price=150)
+
+    def test_add_increments_existing_row_in_place(self):
+        owner = {'user': self.user}
+        self.assertTrue(Cart.objects.add_item(owner, self.item.id))
+        self.assertTrue(Cart.objects.add_item(owner, self.item.id))
+
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Cart.objects.get(user=self.user).quanity, 2)
+
+    def test_add_is_capped_at_max_quantity(self):
+        owner = {'user': self.user}
+        Cart.objects.create(user=self.user, item=self.item, quanity=Cart.objects.MAX_QUANTITY - 1)
+
+        Cart.objects.add_item(owner, self.item.id)
+        Cart.objects.add_item(owner, self.item.id)
+        Cart.objects.add_item(owner, self.other.id, delta=500)
+
+        self.assertEqual(Cart.objects.get(item=self.item).quanity, Cart.objects.MAX_QUANTITY)
+        self.assertEqual(Cart.objects.get(item=self.other).quanity, Cart.objects.MAX_QUANTITY)
+        self.assertEqual(CartSummary.objects.get().item_count, 2 * Cart.objects.MAX_QUANTITY)
+
+    def test_add_unknown_item_returns_404(self):
+        resp = self.client.get(reverse('cart_add', kwargs={'shaurma_id': 999999}))
+        self.assertEqual(resp.status_code, 404)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_set_quantities_upserts_and_deletes(self):
+        Cart.objects.create(user=self.user, item=self.item, quanity=5)
+
+        resp = self.client.post(
+            reverse('cart_set'),
+            data={'items': {str(self.item.id): 0, str(self.other.id): 3, '999999': 2}},
+            content_type='application/json',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['count'], 3)
+        self.assertEqual(resp.json()['total'], 450)
+
+        self.assertFalse(Cart.objects.filter(item=self.item).exists())
+        self.assertEqual(Cart.objects.get(item=self.other).quanity, 3)
+
+        # повторная установка обновляет ту же строку
+        self.client.post(reverse('cart_set'), {f'qty_{self.other.id}': 1})
+        self.assertEqual(Cart.objects.get(item=self.other).quanity, 1)
+
+    def test_set_rejects_malformed_payload(self):
+        resp = self.client.post(reverse('cart_set'), {f'qty_{self.item.id}': 'много'})
+        self.assertEqual(resp.status_code, 400)
+
+
+@override_settings(CART_ANONYMOUS_STORE='session')
+class SessionCartStoreTest(TestCase):
+    def setUp(self):
+        self.item = ShaurmaFactory(name='Классическая', price=100)
+        self.other = ShaurmaFactory(name='Сырная', price=150)
+
+    def test_browsing_without_cart_creates_no_session(self):
+        resp = self.client.get(reverse('catalog'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('sessionid', resp.cookies)
+
+    def test_anonymous_cart_lives_in_session(self):
+        url = reverse('cart_add', kwargs={'shaurma_id': self.item.id})
+        self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        resp = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(resp.json()['count'], 2)
+        self.assertEqual(resp.json()['total'], 200)
+        self.assertFalse(Cart.objects.exists())
+
+        resp = self.client.get(reverse('cart_remove', kwargs={'shaurma_id': self.item.id}), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(resp.json()['count'], 1)
+
+    def test_price_change_changes_etag(self):
+        self.client.get(reverse('cart_add', kwargs={'shaurma_id': self.item.id}))
+        etag = self.client.get(reverse('api_cart'))['ETag']
+        self.assertEqual(self.client.get(reverse('api_cart'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.item.price = 300
+        self.item.save()
+        resp = self.client.get(reverse('api_cart'), {'fields': 'total'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'total': 300})
+
+    def test_badge_count_needs_no_price_query(self):
+        self.client.get(reverse('cart_add', kwargs={'shaurma_id': self.item.id}))
+        self.client.get(reverse('cart_add', kwargs={'shaurma_id': self.other.id}))
+
+        request = self.client.get(reverse('about')).wsgi_request
+        del request.cart
+
+        cart = get_request_cart(request)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(cart.count, 2)
+        self.assertFalse([q for q in ctx.captured_queries if 'main_shaurma' in q['sql']])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(cart.total, 250)
+
+    def test_session_cart_merged_on_login(self):
+        user = UserFactory()
+        user.set_password('secret-pass-123')
+        user.save()
+        Cart.objects.create(user=user, item=self.item, quanity=2)
+
+        self.client.get(reverse('cart_add', kwargs={'shaurma_id': self.item.id}))
+        self.client.get(reverse('cart_add', kwargs={'shaurma_id': self.other.id}))
+
+        self.assertTrue(self.client.login(username=user.username, password='secret-pass-123'))
+
+        self.assertEqual(Cart.objects.get(user=user, item=self.item).quanity, 3)
+        self.assertEqual(Cart.objects.get(user=user, item=self.other).quanity, 1)
+        self.assertNotIn('cart', self.client.session)
+
+
+class RequestCartTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.item = ShaurmaFactory(name='Классическая', price=100)
+        Cart.objects.set_quantities({'user': self.user}, {self.item.id: 2})
+
+    def _cart_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if 'cart_cart' in q['sql']]
+
+    def test_catalog_reads_cart_once_for_badge_and_quantities(self):
+        for name in ('index', 'catalog'):
+            with self.subTest(name=name):
+                self.assertEqual(len(self._cart_queries(reverse(name))), 1)
+
+        self.assertEqual(len(self._cart_queries(reverse('product', kwargs={'slug': self.item.slug}))), 1)
+
+    def test_context_processor_is_lazy(self):
+        from main.context_processors import cart_meta
+
+        request = self.client.get(reverse('about')).wsgi_request
+        del request.cart
+
+        with self.assertNumQueries(0):
+            ctx = cart_meta(request)
+
+        self.assertEqual(ctx['cart_count'], 2)
+
+
+class CartFieldsProjectionTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.item = ShaurmaFactory(price=100)
+
+    def test_count_total_projection_skips_item_rows(self):
+        url = reverse('cart_add', kwargs={'shaurma_id': self.item.id})
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url, {'fields': 'count,total'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(resp.json(), {'count': 1, 'total': 100})
+        # Позиции вместе с товарами (и картинками) не читаются — итоги берутся из CartSummary
+        self.assertFalse([q for q in ctx.captured_queries if '"main_shaurma"."picture"' in q['sql']])
+
+    def test_unknown_field_is_rejected(self):
+        url = reverse('cart_add', kwargs={'shaurma_id': self.item.id})
+        resp = self.client.get(url, {'fields': 'count,picture'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(resp.status_code, 400)
+
+    @override_settings(CART_ANONYMOUS_STORE='session')
+    def test_session_store_projection(self):
+        self.client.logout()
+        url = reverse('cart_add', kwargs={'shaurma_id': self.item.id})
+        self.client.get(url)
+
+        resp = self.client.get(url, {'fields': 'count,total,version'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(resp.json(), {'count': 2, 'total': 200, 'version': 2})
+
+
+class CartSummaryTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.item = ShaurmaFactory(name='Классическая', price=100)
+
+    def _summary(self):
+        return CartSummary.objects.get(pk=CartSummary.key_for({'user': self.user}))
+
+    def test_summary_follows_every_mutation(self):
+        url_add = reverse('cart_add', kwargs={'shaurma_id': self.item.id})
+        first = self.client.get(url_add, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        second = self.client.get(url_add, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+        summary = self._summary()
+        self.assertEqual(summary.item_count, 2)
+        self.assertEqual(summary.subtotal, 200)
+        self.assertEqual(second['version'], summary.version)
+        self.assertGreater(second['version'], first['version'])
+
+        self.client.get(reverse('cart_remove', kwargs={'shaurma_id': self.item.id}))
+        self.assertEqual(self._summary().item_count, 1)
+
+        self.client.post(reverse('checkout'), {'action': 'confirm', 'promo_code': ''})
+        self.assertEqual(self._summary().item_count, 0)
+
+    def test_price_change_refreshes_subtotal(self):
+        Cart.objects.add_item({'user': self.user}, self.item.id)
+        self.item.price = 300
+        self.item.save()
+
+        self.assertEqual(self._summary().subtotal, 300)
+
+    def test_deleting_item_refreshes_summary_and_version(self):
+        other = ShaurmaFactory(name='Сырная', price=50)
+        Cart.objects.add_item({'user': self.user}, self.item.id)
+        Cart.objects.add_item({'user': self.user}, other.id)
+        guest = {'session_key': 'guest-session'}
+        Cart.objects.add_item(guest, self.item.id)
+
+        etag = self.client.get(reverse('api_cart'))['ETag']
+        version = self._summary().version
+
+        self.item.delete()
+
+        summary = self._summary()
+        self.assertEqual((summary.item_count, summary.subtotal), (1, 50))
+        self.assertGreater(summary.version, version)
+        self.assertEqual(CartSummary.objects.get(pk=CartSummary.key_for(guest)).item_count, 0)
+
+        resp = self.client.get(reverse('api_cart'), {'fields': 'count,total'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'count': 1, 'total': 50})
+
+    def test_price_change_refresh_is_set_based(self):
+        users = UserFactory.create_batch(5)
+        for user in users:
+            Cart.objects.add_item({'user': user}, self.item.id)
+
+        item = type(self.item).objects.get(pk=self.item.pk)
+        item.name = 'Переименованная'
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'cart_' in q['sql']])
+
+        item.price = 120
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        self.assertEqual(len([q for q in ctx.captured_queries if 'cart_' in q['sql']]), 2)
+        self.assertEqual(
+            set(CartSummary.objects.filter(pk__in=[f'u:{user.pk}' for user in users]).values_list('subtotal', flat=True)),
+            {120},
+        )
+
+    def test_badge_is_single_primary_key_lookup(self):
+        Cart.objects.add_item({'user': self.user}, self.item.id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('about'))
+
+        cart_queries = [q['sql'] for q in ctx.captured_queries if 'cart_' in q['sql']]
+        self.assertEqual(len(cart_queries), 1)
+        self.assertIn('cart_cartsummary', cart_queries[0])
+        self.assertContains(resp, 'data-cart-count')
+
+
+class PromocodeCacheTest(TestCase):
+    def setUp(self):
+        active_promocodes.invalidate()
+        self.today = timezone.now().date()
+        self.promo = Promocode.objects.create(code_name='Шаурма20', date_add=self.today, discount=20)
+
+    def test_code_key_is_case_folded(self):
+        self.assertEqual(self.promo.code_key, 'шаурма20')
+
+    def test_case_only_duplicate_is_rejected(self):
+        duplicate = Promocode(code_name='ШАУРМА20', date_add=self.today)
+        with self.assertRaisesMessage(ValidationError, 'без учёта регистра'):
+            duplicate.full_clean()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+        self.assertEqual(active_promocodes.get('шаурма20'), self.promo)
+
+    def test_lookup_is_case_insensitive_and_cached(self):
+        self.assertEqual(active_promocodes.get(' ШАУРМА20 '), self.promo)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(active_promocodes.get('шаурма20'), self.promo)
+            self.assertIsNone(active_promocodes.get('NOPE'))
+
+    def test_expired_promocode_is_not_active(self):
+        Promocode.objects.create(code_name='OLD', date_add=self.today - timezone.timedelta(days=30), duration=7)
+        self.assertIsNone(active_promocodes.get('old'))
+
+    def test_cache_invalidated_on_save_and_delete(self):
+        self.assertIsNotNone(active_promocodes.get('шаурма20'))
+
+        self.promo.discount = 50
+        self.promo.save()
+        self.assertEqual(active_promocodes.get('шаурма20').discount, 50)
+
+        self.promo.delete()
+        self.assertIsNone(active_promocodes.get('шаурма20'))
+
+
+class IdempotentCheckoutTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.item = ShaurmaFactory(name='Классическая', price=200)
+        Cart.objects.add_item({'user': self.user}, self.item.id)
+
+    def test_checkout_form_contains_token(self):
+        resp = self.client.get(reverse('checkout'))
+        self.assertContains(resp, 'name="checkout_token"')
+
+    def test_repeated_submit_returns_original_order(self):
+        data = {'action': 'confirm', 'promo_code': '', 'checkout_token': uuid.uuid4().hex}
+
+        first = self.client.post(reverse('checkout'), data)
+        order_code = self.client.session['last_paid_order']['order_code']
+
+        second = self.client.post(reverse('checkout'), data)
+
+        self.assertEqual(first.url, reverse('checkout_thanks'))
+        self.assertEqual(second.url, reverse('checkout_thanks'))
+        self.assertEqual(OrderHeader.objects.count(), 1)
+        self.assertEqual(self.client.session['last_paid_order']['order_code'], order_code)
+        self.assertEqual(self.client.session['last_paid_order']['count'], 1)
+
+    def test_foreign_token_is_conflict(self):
+        token = uuid.uuid4()
+        OrderHeader.objects.create(
+            user=UserFactory(), order_code='ORD-FOREIGN', idempotency_key=token,
+            subtotal=100, discount=0, total=100,
+        )
+
+        resp = self.client.post(reverse('checkout'), {'action': 'confirm', 'promo_code': '', 'checkout_token': token.hex})
+
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(OrderHeader.objects.count(), 1)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+        self.assertNotIn('last_paid_order', self.client.session)
+
+    def test_order_code_collision_retries_with_new_code(self):
+        OrderHeader.objects.create(order_code='ORD-TAKEN', subtotal=100, discount=0, total=100)
+        data = {'action': 'confirm', 'promo_code': '', 'checkout_token': uuid.uuid4().hex}
+
+        with mock.patch('cart.views._new_order_code', side_effect=['ORD-TAKEN', 'ORD-FREE']):
+            resp = self.client.post(reverse('checkout'), data)
+
+        self.assertEqual(resp.url, reverse('checkout_thanks'))
+        self.assertEqual(self.client.session['last_paid_order']['order_code'], 'ORD-FREE')
+        self.assertEqual(OrderHeader.objects.count(), 2)
+
+    def test_retry_after_cart_cleared_returns_committed_order(self):
+        token = uuid.uuid4()
+        order = OrderHeader.objects.create(
+            user=self.user, order_code='ORD-FIRST', idempotency_key=token,
+            subtotal=200, discount=0, total=200,
+        )
+        Cart.objects.filter(user=self.user).delete()
+        data = {'action': 'confirm', 'promo_code': '', 'checkout_token': token.hex}
+
+        # Первая проверка — до коммита параллельного запроса, к расчёту корзины он уже её очистил
+        with mock.patch('cart.views._find_replayed_order', side_effect=[None, order]):
+            resp = self.client.post(reverse('checkout'), data)
+
+        self.assertEqual(resp.url, reverse('checkout_thanks'))
+        self.assertEqual(self.client.session['last_paid_order']['order_code'], 'ORD-FIRST')
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.item = ShaurmaFactory(name='Классическая', price=200)
+        Cart.objects.add_item({'user': self.user}, self.item.id)
+
+    def test_concurrent_posts_create_exactly_one_order(self):
+        data = {'action': 'confirm', 'promo_code': '', 'checkout_token': uuid.uuid4().hex}
+        barrier = threading.Barrier(4)
+        redirects = []
+
+        def submit():
+            client = Client()
+            client.force_login(self.user)
+            barrier.wait()
+            try:
+                redirects.append(client.post(reverse('checkout'), data).url)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(redirects, [reverse('checkout_thanks')] * 4)
+        self.assertEqual(OrderHeader.objects.count(), 1)
+        self.assertEqual(OrderLine.objects.count(), 1)
+
+
+class PurgeCartsCommandTest(TestCase):
+    def setUp(self):
+        self.items = [ShaurmaFactory(name='Классическая', price=100), ShaurmaFactory(name='Сырная', price=150)]
+
+    def _fill(self, owner):
+        for item in self.items:
+            Cart.objects.add_item(owner, item.id)
+
+    def _session(self, expired=False):
+        session = SessionStore()
+        session.create()
+        if expired:
+            Session.objects.filter(pk=session.session_key).update(expire_date=timezone.now() - timedelta(days=1))
+        return session.session_key
+
+    def test_purges_expired_guests_and_idle_users_in_batches(self):
+        alive = {'session_key': self._session()}
+        expired = {'session_key': self._session(expired=True)}
+        missing = {'session_key': 'x' * 32}
+        active_user = {'user': UserFactory()}
+        idle_user = {'user': UserFactory()}
+        for owner in (alive, expired, missing, active_user, idle_user):
+            self._fill(owner)
+        Cart.objects.filter(**idle_user).update(updated_at=timezone.now() - timedelta(days=45))
+        idle_version = CartSummary.objects.get(pk=CartSummary.key_for(idle_user)).version
+
+        out = StringIO()
+        call_command('purge_carts', days=30, batch_size=1, stdout=out)
+
+        self.assertIn('Удалено позиций корзины: 6', out.getvalue())
+        self.assertEqual(Cart.objects.filter(**alive).count(), 2)
+        self.assertEqual(Cart.objects.filter(**active_user).count(), 2)
+        self.assertEqual(Cart.objects.count(), 4)
+
+        self.assertFalse(CartSummary.objects.filter(pk=CartSummary.key_for(expired)).exists())
+        self.assertFalse(CartSummary.objects.filter(pk=CartSummary.key_for(missing)).exists())
+        idle_summary = CartSummary.objects.get(pk=CartSummary.key_for(idle_user))
+        self.assertEqual((idle_summary.item_count, idle_summary.subtotal), (0, 0))
+        self.assertGreater(idle_summary.version, idle_version)
+
+    def test_dry_run_deletes_nothing(self):
+        self._fill({'session_key': self._session(expired=True)})
+
+        out = StringIO()
+        call_command('purge_carts', dry_run=True, stdout=out)
+
+        self.assertIn('Будет удалено гостевых (сессия истекла): 2', out.getvalue())
+        self.assertEqual(Cart.objects.count(), 2)
+
+    def test_invalid_batch_size_fails(self):
+        with self.assertRaisesMessage(CommandError, '--batch-size'):
+            call_command('purge_carts', batch_size=0, stdout=StringIO())
+
+
+class ShaurmaStatsTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.wrap = ShaurmaFactory(name='Классическая', price=100)
+        self.cheese = ShaurmaFactory(name='Сырная', price=150)
+
+    def checkout(self, quantities):
+        Cart.objects.set_quantities({'user': self.user}, quantities)
+        self.client.post(reverse('checkout'), {'action': 'confirm', 'promo_code': ''})
+
+    def test_checkout_updates_counters(self):
+        self.checkout({self.wrap.id: 2})
+        self.checkout({self.wrap.id: 1, self.cheese.id: 3})
+
+        stats = ShaurmaStats.objects.get(shaurma=self.wrap)
+        self.assertEqual((stats.order_count, stats.units_sold, stats.revenue), (2, 3, 300))
+        self.assertEqual((stats.units_7d, stats.units_30d), (3, 3))
+        self.assertEqual(ShaurmaStats.objects.get(shaurma=self.cheese).units_sold, 3)
+
+    def test_rollup_matches_orders_and_moves_windows(self):
+        self.checkout({self.wrap.id: 2})
+        self.checkout({self.cheese.id: 1})
+        OrderHeader.objects.filter(lines__shaurma=self.wrap).update(date=timezone.now() - timedelta(days=10))
+        ShaurmaStats.objects.filter(shaurma=self.cheese).update(order_count=99)
+
+        out = StringIO()
+        call_command('rollup_shaurma_stats', stdout=out)
+
+        self.assertIn('Пересчитана популярность товаров: 2', out.getvalue())
+        wrap = ShaurmaStats.objects.get(shaurma=self.wrap)
+        self.assertEqual((wrap.order_count, wrap.units_7d, wrap.units_30d), (1, 0, 2))
+        self.assertEqual(ShaurmaStats.objects.get(shaurma=self.cheese).order_count, 1)
+
+    def test_index_reads_top_without_order_aggregate(self):
+        self.checkout({self.cheese.id: 1})
+        self.checkout({self.cheese.id: 1, self.wrap.id: 1})
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('index'))
+
+        self.assertNotIn('cart_orderline', ' '.join(q['sql'] for q in ctx.captured_queries))
+        content = resp.content.decode()
+        self.assertLess(content.index('Сырная'), content.index('Классическая'))
+
+    def test_new_order_refreshes_cached_index(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout({self.cheese.id: 1})
+        self.assertNotContains(self.client.get(reverse('index')), 'Классическая')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout({self.wrap.id: 1})
+
+        self.assertContains(self.client.get(reverse('index')), 'Классическая')
+
+    def test_rollup_bumps_index_version(self):
+        self.checkout({self.wrap.id: 1})
+        before = page_versions('index')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ShaurmaStats.objects.rollup()
 
+        self.assertNotEqual(page_versions('index'), before)
@@ -0,0 +1,23 @@
+def get_or_create_session_key( request ) -> str:
+    if not request.session.session_key:
+        request.session.save()
+    return request.session.session_key
+
+
+def get_cart_owner( request ) -> dict:
+    """Фильтр владельца корзины: пользователь или ключ сессии."""
+    if request.user.is_authenticated:
+        return { 'user': request.user }
+    return { 'session_key': get_or_create_session_key( request ) }
+
+
+def parse_fields( value: str | None, allowed: tuple ) -> tuple | None:
+    """'count,total' → ( 'count', 'total' ); None, если поля не заданы. Неизвестное поле — ValueError."""
+    if not value:
+        return None
+
+    fields = tuple( field.strip() for field in value.split( ',' ) if field.strip() )
+    unknown = set( fields ) - set( allowed )
+    if unknown:
+        raise ValueError( f'Неизвестные поля: {", ".join( sorted( unknown ) )}' )
+    return fields
@@ -1,219 +1,200 @@
+import json
 import uuid
 
-from django.http import JsonResponse
-from django.shortcuts import render, redirect, get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import render, redirect
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 
-from cart.models import Cart, Order, Promocode
-from main.models import Shaurma
-
-
-def _get_or_create_session_key(request):
-    if not request.session.session_key:
-        request.session.save()
-    return request.session.session_key
-
-
-def _get_cart_queryset(request):
-    if request.user.is_authenticated:
-        return Cart.objects.filter(user=request.user).select_related('item')
-    session_key = _get_or_create_session_key(request)
-    return Cart.objects.filter(session_key=session_key).select_related('item')
-
-
-def _serialize_cart(request):
-    entries = _get_cart_queryset(request)
-    items = []
-    total = 0
-    total_count = 0
-    for entry in entries:
-        sh = entry.item
-        q = entry.quanity
-        item_total = sh.price * q
-        items.append({
-            'id': sh.id,
-            'name': sh.name,
-            'slug': sh.slug,
-            'price': sh.price,
-            'quantity': q,
-            'total': item_total,
-            'picture': sh.picture.url if getattr(sh, 'picture', None) else None,
-        })
-        total += item_total
-        total_count += q
-    return {
-        'items': items,
-        'total': total,
-        'count': total_count,
-    }
+from cart.models import OrderHeader, OrderLine, ShaurmaStats
+from cart.middleware import get_request_cart
+from cart.utils import get_or_create_session_key, parse_fields
 
 
-def _get_cart_pricing(request, promo_code=None):
-    entries = _get_cart_queryset(request)
-    lines = []
-    subtotal = 0
-    total_count = 0
-    promo = None
-    discount_percent = 0
-
-    if promo_code:
-        now = timezone.now().date()
-        promo = Promocode.objects.filter(
-            code_name__iexact=promo_code.strip(),
-            date_add__lte=now,
-            date_end__gte=now,
-        ).first()
-        if promo:
-            discount_percent = max(0, min(int(promo.discount), 100))
-
-    for entry in entries:
-        sh = entry.item
-        q = entry.quanity
-        line_subtotal = sh.price * q
-        line_discount = round(line_subtotal * (discount_percent / 100))
-        line_total = line_subtotal - line_discount
-        lines.append({
-            'entry': entry,
-            'shaurma': sh,
-            'quantity': q,
-            'unit_price': sh.price,
-            'line_subtotal': line_subtotal,
-            'line_discount': line_discount,
-            'line_total': line_total,
-        })
-        subtotal += line_subtotal
-        total_count += q
-
-    order_discount = round(subtotal * (discount_percent / 100))
-    total = subtotal - order_discount
-
-    return {
-        'lines': lines,
-        'subtotal': subtotal,
-        'discount': order_discount,
-        'discount_percent': discount_percent,
-        'total': total,
-        'count': total_count,
-        'promo': promo,
-        'promo_code': promo_code or '',
-    }
+# Попыток подобрать свободный код заказа: суффикс кода — 6 случайных hex-символов
+ORDER_CODE_ATTEMPTS = 3
 
 
 def cart(request):
-    data = _serialize_cart(request)
+    pricing = get_request_cart(request).pricing
     ctx = {
-        'cart': [
-            {
-                'shaurma': get_object_or_404(Shaurma, id=item['id']),
-                'quantity': item['quantity'],
-                'total': item['total'],
-            }
-            for item in data['items']
-        ],
-        'cart_total': data['total'],
-        'cart_count': data['count'],
+        'cart': pricing.lines,
+        'cart_total': pricing.subtotal,
+        'cart_count': pricing.count,
     }
     return render( request, 'cart/cart.jinja', context=ctx )
 
 
-def cart_add(request, shaurma_id):
-    sh = get_object_or_404(Shaurma, id=shaurma_id)
-    if request.user.is_authenticated:
-        entry, created = Cart.objects.get_or_create(user=request.user, item=sh, defaults={'quanity': 1})
-        if not created:
-            entry.quanity = entry.quanity + 1
-            entry.save(update_fields=['quanity'])
-    else:
-        session_key = _get_or_create_session_key(request)
-        entry, created = Cart.objects.get_or_create(session_key=session_key, item=sh, defaults={'quanity': 1})
-        if not created:
-            entry.quanity = entry.quanity + 1
-            entry.save(update_fields=['quanity'])
-
+def _cart_response(request):
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse(_serialize_cart(request))
+        cart_state = get_request_cart(request)
+        try:
+            fields = parse_fields(request.GET.get('fields'), cart_state.COMPACT_FIELDS)
+        except ValueError as e:
+            return JsonResponse({'detail': str(e)}, status=400)
+
+        # ?fields=count,total — только нужные поля, без чтения позиций
+        if fields is not None:
+            return JsonResponse(cart_state.compact(fields))
+        return JsonResponse({**cart_state.pricing.as_dict(), 'version': cart_state.version})
 
     return redirect('cart')
 
 
+def cart_add(request, shaurma_id):
+    if not get_request_cart(request).add(shaurma_id):
+        raise Http404('Шаурма не найдена')
+
+    return _cart_response(request)
+
+
 def cart_remove(request, shaurma_id):
-    sh = get_object_or_404(Shaurma, id=shaurma_id)
-    if request.user.is_authenticated:
-        try:
-            entry = Cart.objects.get(user=request.user, item=sh)
-            if entry.quanity > 1:
-                entry.quanity -= 1
-                entry.save(update_fields=['quanity'])
-            else:
-                entry.delete()
-        except Cart.DoesNotExist:
-            pass
+    get_request_cart(request).remove(shaurma_id)
+
+    return _cart_response(request)
+
+
+def _parse_quantities(request):
+    if request.content_type == 'application/json':
+        items = json.loads(request.body)['items']
     else:
-        session_key = _get_or_create_session_key(request)
-        try:
-            entry = Cart.objects.get(session_key=session_key, item=sh)
-            if entry.quanity > 1:
-                entry.quanity -= 1
-                entry.save(update_fields=['quanity'])
-            else:
-                entry.delete()
-        except Cart.DoesNotExist:
-            pass
+        items = {
+            key.removeprefix('qty_'): value
+            for key, value in request.POST.items() if key.startswith('qty_')
+        }
 
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse(_serialize_cart(request))
+    return {int(item_id): max(0, int(qty)) for item_id, qty in items.items()}
 
-    return redirect('cart')
 
+@require_POST
+def cart_set(request):
+    try:
+        quantities = _parse_quantities(request)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'detail': 'Некорректный набор позиций'}, status=400)
 
-def checkout(request):
-    promo_code = request.POST.get('promo_code', '').strip() if request.method == 'POST' else request.GET.get('promo', '').strip()
-    pricing = _get_cart_pricing(request, promo_code=promo_code)
-    empty_cart = len(pricing['lines']) == 0
+    get_request_cart(request).set_many(quantities)
 
-    if request.method == 'POST' and request.POST.get('action') == 'confirm':
-        if empty_cart:
-            return redirect('cart')
-
-        order_code = timezone.now().strftime('ORD-%Y%m%d-') + uuid.uuid4().hex[:6].upper()
-        session_key = _get_or_create_session_key(request)
-
-        for row in pricing['lines']:
-            Order.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                session_key=session_key,
-                shaurma=row['shaurma'],
-                quantity=row['quantity'],
-                unit_price=row['unit_price'],
-                line_subtotal=row['line_subtotal'],
-                line_discount=row['line_discount'],
-                line_total=row['line_total'],
-                order_code=order_code,
-                promocode=pricing['promo'],
-                order_subtotal=pricing['subtotal'],
-                order_discount=pricing['discount'],
-                order_total=pricing['total'],
-                payer_name='Galactical Bank Inc.',
-                is_demo_payment=True,
+    return _cart_response(request)
+
+
+def _parse_checkout_token(value):
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _paid_order_summary(order):
+    return {
+        'order_code': order.order_code,
+        'total': order.total,
+        'count': order.lines.aggregate(count=Sum('quantity'))['count'] or 0,
+    }
+
+
+def _find_replayed_order(request, token):
+    """Заказ, уже оформленный по этому токену текущим владельцем корзины."""
+    if token is None:
+        return None
+
+    owner = Q(user=request.user) if request.user.is_authenticated else Q(session_key=request.session.session_key)
+    return OrderHeader.objects.filter(owner, idempotency_key=token).first()
+
+
+def _new_order_code():
+    return timezone.now().strftime('ORD-%Y%m%d-') + uuid.uuid4().hex[:6].upper()
+
+
+def _create_order(request, pricing, token):
+    session_key = get_or_create_session_key(request)
+
+    for attempt in range(ORDER_CODE_ATTEMPTS):
+        order_code = _new_order_code()
+        try:
+            return _insert_order(request, pricing, token, session_key, order_code)
+        except IntegrityError:
+            # Случайный суффикс совпал с кодом другого заказа — берём новый; иначе ошибку разбирает checkout
+            if attempt + 1 == ORDER_CODE_ATTEMPTS or not OrderHeader.objects.filter(order_code=order_code).exists():
+                raise
+
+
+def _insert_order(request, pricing, token, session_key, order_code):
+    with transaction.atomic():
+        order = OrderHeader.objects.create(
+            user=request.user if request.user.is_authenticated else None,
+            session_key=session_key,
+            order_code=order_code,
+            idempotency_key=token,
+            promocode=pricing.promo,
+            subtotal=pricing.subtotal,
+            discount=pricing.discount,
+            total=pricing.total,
+            payer_name='Galactical Bank Inc.',
+            is_demo_payment=True,
+        )
+        lines = OrderLine.objects.bulk_create([
+            OrderLine(
+                order=order,
+                shaurma=row.shaurma,
+                quantity=row.quantity,
+                unit_price=row.unit_price,
+                line_subtotal=row.line_subtotal,
+                line_discount=row.line_discount,
+                line_total=row.line_total,
             )
+            for row in pricing.lines
+        ])
+        ShaurmaStats.objects.record_order(lines)
+        get_request_cart(request).clear()
 
-        _get_cart_queryset(request).delete()
+    return order
 
-        request.session['last_paid_order'] = {
-            'order_code': order_code,
-            'total': pricing['total'],
-            'count': pricing['count'],
-        }
+
+def checkout(request):
+    promo_code = request.POST.get('promo_code', '').strip() if request.method == 'POST' else request.GET.get('promo', '').strip()
+
+    if request.method == 'POST' and request.POST.get('action') == 'confirm':
+        token = _parse_checkout_token(request.POST.get('checkout_token'))
+
+        # Повторная отправка формы (двойной клик, ретрай прокси) — отдаём уже оформленный заказ
+        order = _find_replayed_order(request, token)
+
+        if order is None:
+            pricing = get_request_cart(request).price(promo_code)
+            if pricing.is_empty:
+                # Параллельный запрос мог оформить заказ и очистить корзину уже после первой проверки
+                order = _find_replayed_order(request, token)
+                if order is None:
+                    return redirect('cart')
+            else:
+                try:
+                    order = _create_order(request, pricing, token)
+                except IntegrityError:
+                    # Параллельный запрос с тем же токеном успел оформить заказ первым
+                    order = _find_replayed_order(request, token)
+                    if order is None:
+                        if token is None or not OrderHeader.objects.filter(idempotency_key=token).exists():
+                            raise
+                        # Токен уже занят заказом другого владельца — это конфликт, а не повтор
+                        return HttpResponse('Токен оформления уже использован.', status=409)
+
+        request.session['last_paid_order'] = _paid_order_summary(order)
         return redirect('checkout_thanks')
 
+    pricing = get_request_cart(request).price(promo_code)
+
     promo_error = ''
-    if promo_code and not pricing['promo']:
+    if promo_code and not pricing.promo:
         promo_error = 'Промокод не найден или просрочен.'
 
     ctx = {
         'pricing': pricing,
         'promo_error': promo_error,
         'bank_name': 'Galactical Bank Inc.',
+        'checkout_token': uuid.uuid4().hex,
     }
     return render(request, 'cart/checkout.jinja', context=ctx)
 
@@ -2,4 +2,5 @@ from .address import BaseAddressAdmin, AddressAdmin
 from .geo import (GeoPartWorldAdmin, GeoRegionWorldAdmin, GeoCountryAdmin,
                   GeoNodeAdmin, GeoNodeTypeAdmin, GeoCityAdmin,
                   GeoStreetTypeAdmin, GeoStreetAdmin)
+from .imports import GeoImportRunAdmin
 from .timezones import TimeZoneAdmin
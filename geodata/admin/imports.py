@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from geodata.models import GeoImportRun
+
+
+@admin.register( GeoImportRun )
+class GeoImportRunAdmin(admin.ModelAdmin):
+	list_display    = [ 'source', 'watermark', 'is_full', 'created', 'updated', 'skipped', 'finished_at' ]
+	list_filter     = [ 'source', 'is_full' ]
+	readonly_fields = [ 'source', 'checksum', 'watermark', 'is_full', 'created', 'updated', 'skipped', 'finished_at' ]
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
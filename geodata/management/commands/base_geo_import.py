@@ -1,20 +1,45 @@
+import hashlib
+import multiprocessing
 import os
 import sqlite3
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import batched
+from pathlib import Path
 
+import django
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
+from geodata.models import GeoImportRun
+
 
 class BaseGeoImportCommand( BaseCommand, ABC ):
-	"""Базовый класс для импорта гео-данных из SQLite"""
+	"""
+	Базовый класс для импорта гео-данных из SQLite.
+	Строки читаются из источника потоком ( fetchmany ) и импортируются пачками: существующие ключи
+	читаются одним запросом в словарь, каждая пачка делится на новые и изменённые записи
+	и пишется bulk_create / bulk_update.
+	Каждый импорт записывается в GeoImportRun: следующий запуск пропускает неизменённый файл
+	и читает только строки с updated_at новее отметки прошлого.
+	С --workers N строки делятся по стране и разбираются ( parse_row ) в N процессах,
+	а запись в БД остаётся в одном процессе.
+	"""
 
 	# Переопределить в подклассах
 	SOURCE_DB_NAME = ""  # Имя файла (states.sqlite3, cities.sqlite3)
 	TABLE_NAME     = ""  # Таблица в БД
+	SOURCE_COLUMNS = ()  # Читаемые колонки таблицы ( id обязателен )
+	PARTITION_COLUMN = "country_code"  # Колонка, по которой строки делятся между процессами
 	LOG_INTERVAL   = 1   # Логировать каждые N строк
 
+	MODEL         = None  # Модель, в которую идёт импорт
+	KEY_FIELDS    = ()    # Поля ( attname ), из которых _object_keys строит ключи поиска
+	UPDATE_FIELDS = ()    # Поля, которые перезаписываются у существующих записей
+	BATCH_SIZE    = 1000
+
 	def __init__( self, *args, **kwargs ):
 		super().__init__( *args, **kwargs )
 		self.created = 0
@@ -23,6 +48,10 @@ class BaseGeoImportCommand( BaseCommand, ABC ):
 		self.errors = 0
 		self.processed = 0
 		self.total = 0
+		self.known = { }  # ключ -> запись ( _Known ) для существующих и ожидающих вставки объектов
+		self.source = None  # Соединение с SQLite-источником на время импорта
+		self.where = ""    # Условие отбора строк источника и его параметры
+		self.params = ()
 
 	def add_arguments( self, parser ):
 		parser.add_argument(
@@ -30,39 +59,210 @@ class BaseGeoImportCommand( BaseCommand, ABC ):
 			action = 'store_true',
 			help = 'Выводить лог для каждой строки (медленно)',
 		)
+		parser.add_argument(
+			'--batch-size',
+			type = int,
+			default = self.BATCH_SIZE,
+			help = f'Строк в одной пачке записи в БД (по умолчанию {self.BATCH_SIZE})',
+		)
+		parser.add_argument(
+			'--source-dir',
+			default = os.path.join( os.getcwd(), "temp" ),
+			help = 'Каталог с исходными SQLite базами (по умолчанию ./temp)',
+		)
+		parser.add_argument(
+			'--workers',
+			type = int,
+			default = 1,
+			help = 'Процессов для разбора строк, по странам (по умолчанию 1 — без пула)',
+		)
+		parser.add_argument(
+			'--full',
+			action = 'store_true',
+			help = 'Прочитать все строки источника, не глядя на отметку прошлого импорта',
+		)
 
 	def handle( self, *args, **options ):
 		self.verbose = options.get( 'verbose', False )
+		self.batch_size = max( 1, options.get( 'batch_size' ) or self.BATCH_SIZE )
+		workers = max( 1, options.get( 'workers' ) or 1 )
 
-		db_path = os.path.join( os.getcwd(), "temp", self.SOURCE_DB_NAME )
+		db_path = os.path.join( options.get( 'source_dir' ) or os.path.join( os.getcwd(), "temp" ), self.SOURCE_DB_NAME )
 		if not os.path.exists( db_path ):
 			raise CommandError( f"SQLite база не найдена: {db_path}" )
 
+		checksum = self._file_checksum( db_path )
+		last_run = None if options.get( 'full' ) else GeoImportRun.objects.last_for( self.SOURCE_DB_NAME )
+		if last_run and last_run.checksum == checksum:
+			self.stdout.write( self.style.SUCCESS( f"Файл {self.SOURCE_DB_NAME} не изменился с прошлого импорта — пропуск" ) )
+			return
+
 		self.stdout.write( f"Чтение SQLite: {db_path}" )
 
 		conn = sqlite3.connect( db_path )
 		conn.row_factory = sqlite3.Row
+		self.source = conn
 
 		try:
-			rows = conn.execute( f"SELECT * FROM {self.TABLE_NAME}" ).fetchall()
+			watermark = conn.execute( f'SELECT MAX("updated_at") FROM {self.TABLE_NAME}' ).fetchone()[0] or ""
+			if last_run and last_run.watermark:
+				# Строки без даты считаются изменёнными, как и при полном проходе
+				self.where = ' WHERE ( "updated_at" > ? OR "updated_at" IS NULL )'
+				self.params = ( last_run.watermark, )
+				self.stdout.write( f"Инкрементальный импорт: updated_at > {last_run.watermark}" )
+
+			self.total = conn.execute( f"SELECT COUNT(*) FROM {self.TABLE_NAME}{self.where}", self.params ).fetchone()[0]
+			self.stdout.write( f"Найдено записей в {self.TABLE_NAME}: {self.total}" )
+
+			with transaction.atomic():
+				self._load_known()
+				chunks = self._read_chunks( conn ) if workers == 1 else self._read_parallel( conn, db_path, workers )
+				for chunk in chunks:
+					self._import_chunk( chunk )
+				self._finish()
+
+				GeoImportRun.objects.create(
+					source = self.SOURCE_DB_NAME,
+					checksum = checksum,
+					watermark = str( watermark ),
+					is_full = not self.where,
+					created = self.created,
+					updated = self.updated,
+					skipped = self.skipped,
+				)
 		finally:
 			conn.close()
 
-		self.total = len( rows )
-		self.stdout.write( f"Найдено записей в {self.TABLE_NAME}: {self.total}" )
+		self._log_summary()
+
+	@staticmethod
+	def _file_checksum( path: str ) -> str:
+		digest = hashlib.sha256()
+		with open( path, 'rb' ) as f:
+			while block := f.read( 1024 * 1024 ):
+				digest.update( block )
+		return digest.hexdigest()
+
+	def _select_sql( self ) -> str:
+		columns = ", ".join( f'"{column}"' for column in self.SOURCE_COLUMNS ) or "*"
+		return f"SELECT {columns} FROM {self.TABLE_NAME}"
+
+	def _read_chunks( self, conn: sqlite3.Connection ):
+		"""Разобранные строки источника пачками по batch_size: в памяти не больше одной пачки"""
+		cursor = conn.execute( self._select_sql() + self.where, self.params )
+		while chunk := cursor.fetchmany( self.batch_size ):
+			try:
+				yield parse_rows( self.parse_row, chunk )
+			except ValueError as e:
+				self.errors += 1
+				self.stderr.write( f"[error] {e}" )
+				raise
+
+	def _read_parallel( self, conn: sqlite3.Connection, db_path: str, workers: int ):
+		"""
+		Строки, разобранные в пуле процессов: задача — все строки одной страны, воркер сам читает их
+		из источника. В работе не больше двух задач на процесс, результаты отдаются в порядке стран.
+		"""
+		column = f'"{self.PARTITION_COLUMN}"'
+		partitions = [
+			value for ( value, ) in
+			conn.execute( f"SELECT DISTINCT {column} FROM {self.TABLE_NAME}{self.where}", self.params )
+		]
+		sql = self._select_sql() + ( f"{self.where} AND" if self.where else " WHERE" ) + f" {column} IS ?"
+		self.stdout.write( f"Разбор в {workers} процессах, частей: {len( partitions )}" )
 
-		with transaction.atomic():
-			for row in rows:
+		# spawn: дочерние процессы не наследуют соединение Django с открытой транзакцией
+		context = multiprocessing.get_context( "spawn" )
+		with ProcessPoolExecutor( max_workers = workers, mp_context = context, initializer = django.setup ) as pool:
+			queue = iter( partitions )
+			pending = deque()
+
+			def submit():
+				for value in queue:
+					pending.append( pool.submit( parse_partition, db_path, sql, ( *self.params, value ), self.parse_row ) )
+					break
+
+			for _ in range( workers * 2 ):
+				submit()
+
+			while pending:
 				try:
-					self.processed += 1
-					self._process_row( row )
-					self._log_progress()
-				except Exception as e:
+					rows = pending.popleft().result()
+				except ValueError as e:
 					self.errors += 1
-					self.stderr.write( f"[error] row id={row['id']}: {e}" )
+					self.stderr.write( f"[error] {e}" )
 					raise
+				submit()
+				yield from batched( rows, self.batch_size )
 
-		self._log_summary()
+	def _load_known( self ):
+		"""Все существующие ключи модели — одним запросом"""
+		self.known.clear()
+		existing = self.MODEL.objects.order_by( 'pk' ).values( 'pk', 'updated_at', *self.KEY_FIELDS )
+		for values in existing.iterator( chunk_size = self.batch_size ):
+			entry = _Known( values['pk'], values['updated_at'] )
+			for key in self._object_keys( values ):
+				# Как .first(): при дублях ключа побеждает запись с меньшим pk
+				self.known.setdefault( key, entry )
+
+	def _find( self, values: dict ):
+		for key in self._object_keys( values ):
+			entry = self.known.get( key )
+			if entry is not None:
+				return entry
+		return None
+
+	def _import_chunk( self, chunk ):
+		"""Разобрать пачку строк, разделить на вставки и обновления и записать их"""
+		creates = []
+		updates = { }
+		imported = []
+
+		for data in chunk:
+			try:
+				self.processed += 1
+				obj = self._build_object( data )
+			except Exception as e:
+				self.errors += 1
+				self.stderr.write( f"[error] row id={data['id']}: {e}" )
+				raise
+
+			values = { field: getattr( obj, field ) for field in self.KEY_FIELDS }
+			entry = self._find( values )
+
+			if entry is None:
+				entry = _Known( None, obj.updated_at, obj )
+				for key in self._object_keys( values ):
+					self.known.setdefault( key, entry )
+				creates.append( entry )
+				self.created += 1
+			elif self._should_update( entry.updated_at, obj.updated_at ):
+				entry.updated_at = obj.updated_at
+				if entry.pk is None:
+					# Дубль ещё не записанной строки — вставится более свежая версия
+					entry.obj = obj
+				else:
+					obj.pk = entry.pk
+					updates[ entry.pk ] = obj
+				self.updated += 1
+			else:
+				self.skipped += 1
+
+			imported.append( ( data['id'], entry ) )
+			self._log_progress()
+
+		self._flush( creates, list( updates.values() ) )
+		self._on_flushed( [ ( row_id, entry.pk ) for row_id, entry in imported ] )
+
+	def _flush( self, creates: list, updates: list ):
+		"""Записать пачку: вставки и обновления пачками по batch_size"""
+		if creates:
+			objs = [ entry.obj for entry in creates ]
+			self.MODEL.objects.bulk_create( objs, batch_size = self.batch_size )
+			for entry, obj in zip( creates, objs ):
+				entry.pk, entry.obj = obj.pk, None
+		if updates:
+			self.MODEL.objects.bulk_update( updates, self.UPDATE_FIELDS, batch_size = self.batch_size )
 
 	def _log_progress( self ):
 		"""Логировать прогресс по интервалу"""
@@ -79,15 +279,66 @@ class BaseGeoImportCommand( BaseCommand, ABC ):
 			f"skipped={self.skipped}, errors={self.errors}"
 		) )
 
-	def _should_update( self, existing_obj, updated_at_src: datetime ) -> bool:
+	def _should_update( self, updated_at_dst: datetime | None, updated_at_src: datetime | None ) -> bool:
 		"""Проверить, нужно ли обновлять объект"""
-		if not hasattr( existing_obj, 'updated_at' ):
-			return True
-		if not updated_at_src:
+		if not updated_at_dst or not updated_at_src:
 			return True
-		return updated_at_src > existing_obj.updated_at
+		return updated_at_src > updated_at_dst
+
+	def _on_flushed( self, pairs: list ):
+		"""( id строки источника, pk записи ) после записи пачки — переопределить при необходимости"""
+		pass
+
+	def _finish( self ):
+		"""Действия после импорта всех строк, в той же транзакции"""
+		pass
 
 	@abstractmethod
-	def _process_row( self, row: sqlite3.Row ):
-		"""Переопределить в подклассе для обработки каждой строки"""
+	def _object_keys( self, values: dict ) -> list:
+		"""Ключи поиска существующей записи по значениям KEY_FIELDS, в порядке приоритета"""
 		pass
+
+	@staticmethod
+	@abstractmethod
+	def parse_row( row: sqlite3.Row ) -> dict:
+		"""
+		Значения полей из строки источника без обращений к БД. Выполняется и в процессах пула,
+		поэтому в подклассе — staticmethod над функцией уровня модуля
+		"""
+		pass
+
+	@abstractmethod
+	def _build_object( self, data: dict ):
+		"""Переопределить в подклассе: несохранённый объект MODEL из разобранной строки ( parse_row )"""
+		pass
+
+
+def parse_rows( parse, rows ) -> list[dict]:
+	"""parse для каждой строки; ошибка — ValueError с id строки"""
+	parsed = []
+	for row in rows:
+		try:
+			parsed.append( parse( row ) )
+		except Exception as e:
+			raise ValueError( f"row id={row['id']}: {e}" ) from e
+	return parsed
+
+
+def parse_partition( db_path: str, sql: str, params: tuple, parse ) -> list[dict]:
+	"""Задача процесса пула: прочитать часть источника только на чтение и разобрать её"""
+	conn = sqlite3.connect( f"{Path( db_path ).resolve().as_uri()}?mode=ro", uri = True )
+	conn.row_factory = sqlite3.Row
+	try:
+		return parse_rows( parse, conn.execute( sql, params ) )
+	finally:
+		conn.close()
+
+
+class _Known:
+	"""Запись, известная импорту: pk ( None — ещё не вставлена ), дата изменения и объект для вставки"""
+	__slots__ = ( 'pk', 'updated_at', 'obj' )
+
+	def __init__( self, pk, updated_at, obj = None ):
+		self.pk = pk
+		self.updated_at = updated_at
+		self.obj = obj
@@ -6,12 +6,52 @@ from geodata.utils import parse_dt, to_float, to_int, parse_translations, get_lo
 from .base_geo_import import BaseGeoImportCommand
 
 
+# Значения parse_city, которые не поля GeoCity, а ключи строки и кешей
+LOOKUP_KEYS = ( "id", "node_iso_code", "timezone" )
+
+
+def parse_city( row ) -> dict:
+	"""Строка cities → значения полей GeoCity ( регион и пояс — ключами для кешей )"""
+	city_name = row["name"]
+	translations = parse_translations( row["translations"] )
+	now_utc = datetime.now( timezone.utc )
+
+	return {
+		"id": row["id"],
+		# Находим регион по RU-PRI
+		"node_iso_code": f'{row["country_code"]}-{row["state_code"]}',
+		"timezone": row["timezone"],
+		"name_ru": get_localized_name( translations, city_name, "ru" ),
+		"name_en": city_name,
+		"name_native": row["native"] or city_name,
+		"latitude": float( row["latitude"] ),
+		"longitude": float( row["longitude"] ),
+		"population": to_int( row["population"] ),
+		"wiki_data_id": row["wikiDataId"] or None,
+		"created_at": parse_dt( row["created_at"] ) or now_utc,
+		"updated_at": parse_dt( row["updated_at"] ) or now_utc,
+	}
+
+
 class Command( BaseGeoImportCommand ):
 	help = "Импорт/обновление городов из temp/cities.sqlite3"
 
 	SOURCE_DB_NAME = "cities.sqlite3"
 	TABLE_NAME     = "cities"
 	LOG_INTERVAL    = 500
+	SOURCE_COLUMNS = (
+		"id", "name", "country_code", "state_code", "timezone", "translations", "native",
+		"latitude", "longitude", "population", "wikiDataId", "created_at", "updated_at",
+	)
+
+	MODEL         = GeoCity
+	KEY_FIELDS    = ( "node_id", "name_ru" )
+	UPDATE_FIELDS = (
+		"node", "name_ru", "name_en", "name_native", "latitude", "longitude",
+		"timezone", "population", "wiki_data_id", "created_at", "updated_at",
+	)
+
+	parse_row = staticmethod( parse_city )
 
 	def __init__( self, *args, **kwargs ):
 		super().__init__( *args, **kwargs )
@@ -36,75 +76,14 @@ class Command( BaseGeoImportCommand ):
 		except TimeZone.DoesNotExist:
 			return None
 
-	def _process_row( self, row ):
-		"""Обработка строки cities"""
-		country_code = row["country_code"]
-		state_code = row["state_code"]
-		city_name = row["name"]
-		tz_name = row["timezone"]
-
-		# Находим регион по RU-PRI
-		node_iso_code = f"{country_code}-{state_code}"
-		district = self.node_cache.get( node_iso_code )
-
-		# Timezone
-		tz_obj = self.tz_cache.get( tz_name )
-
-		# Парсим данные
-		translations = parse_translations( row["translations"] )
-		name_ru = get_localized_name( translations, city_name, "ru" )
-		name_en = city_name
-		name_native = row["native"] or city_name
-
-		latitude = float( row["latitude"] )
-		longitude = float( row["longitude"] )
-		population = to_int( row["population"] )
-		wiki_id = row["wikiDataId"]
-
-		created_at_src = parse_dt( row["created_at"] )
-		updated_at_src = parse_dt( row["updated_at"] )
-
-		now_utc = datetime.now( timezone.utc )
-		if not created_at_src:
-			created_at_src = now_utc
-		if not updated_at_src:
-			updated_at_src = now_utc
-
-		# Поиск GeoCity
-		city = GeoCity.objects.filter( node = district, name_ru = name_ru ).first()
-
-		if city is None:
-			# Создаём
-			city = GeoCity(
-				node = district,
-				name_ru = name_ru,
-				name_en = name_en,
-				name_native = name_native,
-				latitude = latitude,
-				longitude = longitude,
-				timezone = tz_obj,
-				population = population,
-				wiki_data_id = wiki_id or None,
-				created_at = created_at_src,
-				updated_at = updated_at_src,
-			)
-			city.save()
-			self.created += 1
-		else:
-			# Обновляем по дате
-			if self._should_update( city, updated_at_src ):
-				city.node = district
-				city.name_ru = name_ru
-				city.name_en = name_en
-				city.name_native = name_native
-				city.latitude = latitude
-				city.longitude = longitude
-				city.timezone = tz_obj
-				city.population = population
-				city.wiki_data_id = wiki_id or None
-				city.created_at = created_at_src
-				city.updated_at = updated_at_src
-				city.save()
-				self.updated += 1
-			else:
-				self.skipped += 1
+	def _object_keys( self, values: dict ) -> list:
+		return [ ( values["node_id"], values["name_ru"] ) ]
+
+	def _build_object( self, data: dict ) -> GeoCity:
+		"""Город из разобранной строки cities"""
+		fields = { field: value for field, value in data.items() if field not in LOOKUP_KEYS }
+		return GeoCity(
+			node = self.node_cache.get( data["node_iso_code"] ),
+			timezone = self.tz_cache.get( data["timezone"] ),
+			**fields,
+		)
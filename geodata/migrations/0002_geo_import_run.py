@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geodata', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=64, verbose_name='Источник')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256 файла')),
+                ('watermark', models.CharField(blank=True, help_text='Значение как в источнике: строки сравниваются с ним в SQLite', max_length=32, verbose_name='Макс. updated_at источника')),
+                ('is_full', models.BooleanField(default=True, verbose_name='Полный проход')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='Создано')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Обновлено')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Пропущено')),
+                ('finished_at', models.DateTimeField(auto_now_add=True, verbose_name='Завершён')),
+            ],
+            options={
+                'verbose_name': 'импорт гео-данных',
+                'verbose_name_plural': 'импорты гео-данных',
+                'db_table': 'geo_import_runs',
+                'ordering': ['-finished_at'],
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from .address import BaseAddress, Address
 from .geo import (GeoPartWorld, GeoRegionWorld, GeoCountry,
                   GeoNodeType, GeoNode, GeoCity,
                   GeoStreetType, GeoStreet)
+from .imports import GeoImportRun
 from .timezones import TimeZone
 
 __all__ = [
@@ -9,5 +10,6 @@ __all__ = [
     'GeoPartWorld', 'GeoRegionWorld', 'GeoCountry',
     'GeoNodeType', 'GeoNode', 'GeoCity',
     'GeoStreetType', 'GeoStreet',
+    'GeoImportRun',
     'TimeZone'
 ]
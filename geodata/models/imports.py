@@ -0,0 +1,34 @@
+from django.db import models as m
+
+
+class GeoImportRunManager( m.Manager ):
+
+	def last_for( self, source: str ):
+		"""Последний завершённый импорт источника или None"""
+		return self.filter( source = source ).order_by( '-finished_at', '-id' ).first()
+
+
+class GeoImportRun( m.Model ):
+	"""Завершённый импорт гео-данных: отметка для следующего инкрементального запуска"""
+	source    = m.CharField( max_length = 64, db_index = True, verbose_name = 'Источник' )
+	checksum  = m.CharField( max_length = 64, verbose_name = 'SHA-256 файла' )
+	watermark = m.CharField( max_length = 32, blank = True, verbose_name = 'Макс. updated_at источника',
+	                         help_text = 'Значение как в источнике: строки сравниваются с ним в SQLite' )
+
+	is_full = m.BooleanField( default = True, verbose_name = 'Полный проход' )
+	created = m.PositiveIntegerField( default = 0, verbose_name = 'Создано' )
+	updated = m.PositiveIntegerField( default = 0, verbose_name = 'Обновлено' )
+	skipped = m.PositiveIntegerField( default = 0, verbose_name = 'Пропущено' )
+
+	finished_at = m.DateTimeField( auto_now_add = True, verbose_name = 'Завершён' )
+
+	objects = GeoImportRunManager()
+
+	def __str__( self ):
+		return f'{self.source} @ {self.watermark or "—"}'
+
+	class Meta:
+		verbose_name = 'импорт гео-данных'
+		verbose_name_plural = 'импорты гео-данных'
+		db_table = 'geo_import_runs'
+		ordering = [ '-finished_at' ]
@@ -0,0 +1,280 @@
+import io
+import json
+import os
+import sqlite3
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from geodata.factories import GeoCountryFactory, GeoNodeTypeFactory, TimeZoneFactory
+from geodata.management.commands.load_cities_data import Command as LoadCitiesCommand
+from geodata.management.commands.load_states_data import tree_levels
+from geodata.models import GeoCity, GeoImportRun, GeoNode
+
+
+STATES_COLUMNS = (
+	'id', 'name', 'country_code', 'type', 'timezone', 'translations', 'native', 'latitude', 'longitude',
+	'population', 'iso3166_2', 'wikiDataId', 'created_at', 'updated_at', 'level', 'parent_id',
+)
+CITIES_COLUMNS = (
+	'id', 'name', 'country_code', 'state_code', 'timezone', 'translations', 'native', 'latitude', 'longitude',
+	'population', 'wikiDataId', 'created_at', 'updated_at',
+)
+
+
+def state_row(id, name, iso, parent_id=None, updated_at='2024-01-01 00:00:00', level=1, country='RU'):
+	return (
+		id, name, country, None, 'Europe/Moscow', json.dumps({'ru': f'{name} RU'}), name, '55.0', '37.0',
+		'1000', iso, f'Q{id}', '2023-01-01 00:00:00', updated_at, level, parent_id,
+	)
+
+
+def city_row(id, name, state_code='MOW', updated_at='2024-01-01 00:00:00', population='100', country='RU', latitude='55.7'):
+	return (
+		id, name, country, state_code, 'Europe/Moscow', json.dumps({'ru': f'{name} RU'}), None, latitude, '37.6',
+		population, f'Q{id}', '2023-01-01 00:00:00', updated_at,
+	)
+
+
+class GeoImportTestCase(TestCase):
+	def setUp(self):
+		self.country = GeoCountryFactory(cca2='RU')
+		self.tz = TimeZoneFactory(tz='Europe/Moscow')
+		GeoNodeTypeFactory(pk=0, name_en='default')
+
+		self.source = tempfile.TemporaryDirectory()
+		self.addCleanup(self.source.cleanup)
+
+	def write_source(self, name, table, columns, rows):
+		path = os.path.join(self.source.name, name)
+		if os.path.exists(path):
+			os.remove(path)
+		with sqlite3.connect(path) as conn:
+			conn.execute(f'CREATE TABLE {table} ({", ".join(columns)})')
+			conn.executemany(f'INSERT INTO {table} VALUES ({", ".join("?" * len(columns))})', rows)
+		conn.close()
+
+	def load(self, command, **options):
+		out = io.StringIO()
+		call_command(command, source_dir=self.source.name, stdout=out, **options)
+		return out.getvalue()
+
+
+class BulkUpsertTest(GeoImportTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write_source('states.sqlite3', 'states', STATES_COLUMNS, [
+			state_row(1, 'Central', 'RU-CFD', level=0),
+			state_row(2, 'Moscow', 'RU-MOW', parent_id=1),
+		])
+		self.load('load_states_data')
+		self.moscow = GeoNode.objects.get(iso_code='RU-MOW')
+
+	def test_states_create_nodes_and_parents(self):
+		self.assertEqual(GeoNode.objects.count(), 2)
+		self.assertEqual(self.moscow.parent.iso_code, 'RU-CFD')
+		self.assertEqual(self.moscow.name_ru, 'Moscow RU')
+
+	def test_cities_create_update_and_skip(self):
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, [city_row(i, f'City {i}') for i in range(1, 51)])
+		output = self.load('load_cities_data', batch_size=7)
+
+		self.assertIn('created=50, updated=0, skipped=0', output)
+		self.assertEqual(GeoCity.objects.filter(node=self.moscow).count(), 50)
+
+		rows = [city_row(i, f'City {i}') for i in range(1, 51)]
+		rows[0] = city_row(1, 'City 1', updated_at='2025-01-01 00:00:00', population='777')
+		rows.append(city_row(51, 'City 51'))
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, rows)
+		output = self.load('load_cities_data', batch_size=7, full=True)
+
+		self.assertIn('created=1, updated=1, skipped=49', output)
+		self.assertEqual(GeoCity.objects.count(), 51)
+		self.assertEqual(GeoCity.objects.get(name_ru='City 1 RU').population, 777)
+
+	def test_duplicate_rows_in_source_make_one_city(self):
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, [
+			city_row(1, 'Twin'),
+			city_row(2, 'Twin', updated_at='2025-01-01 00:00:00', population='5'),
+		])
+		output = self.load('load_cities_data')
+
+		self.assertIn('created=1, updated=1', output)
+		self.assertEqual(GeoCity.objects.get(name_ru='Twin RU').population, 5)
+
+	def test_queries_do_not_grow_per_row(self):
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, [city_row(i, f'City {i}') for i in range(1, 301)])
+
+		with CaptureQueriesContext(connection) as ctx:
+			self.load('load_cities_data', batch_size=100)
+
+		self.assertEqual(GeoCity.objects.count(), 300)
+		self.assertLess(len(ctx.captured_queries), 30)
+
+
+class StreamingReaderTest(GeoImportTestCase):
+	def test_reads_needed_columns_in_chunks(self):
+		# Лишняя колонка источника не читается
+		columns = CITIES_COLUMNS + ('blob',)
+		self.write_source('cities.sqlite3', 'cities', columns, [city_row(i, f'City {i}') + ('x' * 100,) for i in range(1, 24)])
+
+		command = LoadCitiesCommand()
+		command.batch_size = 10
+		conn = sqlite3.connect(os.path.join(self.source.name, 'cities.sqlite3'))
+		conn.row_factory = sqlite3.Row
+		try:
+			chunks = list(command._read_chunks(conn))
+			columns = [column[0] for column in conn.execute(command._select_sql()).description]
+		finally:
+			conn.close()
+
+		self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 3])
+		self.assertEqual(tuple(columns), LoadCitiesCommand.SOURCE_COLUMNS)
+		self.assertEqual(chunks[0][0]['node_iso_code'], 'RU-MOW')
+
+	def test_progress_uses_source_count(self):
+		self.write_source('states.sqlite3', 'states', STATES_COLUMNS, [state_row(1, 'Moscow', 'RU-MOW')])
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, [city_row(i, f'City {i}') for i in range(1, 4)])
+		self.load('load_states_data')
+
+		output = self.load('load_cities_data')
+		self.assertIn('Найдено записей в cities: 3', output)
+
+
+class IncrementalImportTest(GeoImportTestCase):
+	def setUp(self):
+		super().setUp()
+		self.states = [
+			state_row(1, 'Central', 'RU-CFD', level=0),
+			state_row(2, 'Moscow', 'RU-MOW', parent_id=1),
+		]
+		self.write_source('states.sqlite3', 'states', STATES_COLUMNS, self.states)
+		self.load('load_states_data')
+
+		self.cities = [city_row(i, f'City {i}') for i in range(1, 11)]
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, self.cities)
+		self.load('load_cities_data')
+
+	def test_run_records_watermark(self):
+		run = GeoImportRun.objects.last_for('cities.sqlite3')
+		self.assertEqual(run.watermark, '2024-01-01 00:00:00')
+		self.assertTrue(run.is_full)
+		self.assertEqual(run.created, 10)
+		self.assertEqual(len(run.checksum), 64)
+
+	def test_unchanged_file_is_skipped(self):
+		with CaptureQueriesContext(connection) as ctx:
+			output = self.load('load_cities_data')
+
+		self.assertIn('не изменился', output)
+		self.assertEqual(len(ctx.captured_queries), 1)
+		self.assertEqual(GeoImportRun.objects.filter(source='cities.sqlite3').count(), 1)
+
+	def test_only_rows_after_watermark_are_read(self):
+		self.cities[3] = city_row(4, 'City 4', updated_at='2024-06-01 00:00:00', population='444')
+		self.cities.append(city_row(11, 'City 11', updated_at='2024-06-01 00:00:00'))
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, self.cities)
+
+		output = self.load('load_cities_data')
+
+		self.assertIn('Найдено записей в cities: 2', output)
+		self.assertIn('created=1, updated=1, skipped=0', output)
+		self.assertEqual(GeoCity.objects.get(name_ru='City 4 RU').population, 444)
+
+		run = GeoImportRun.objects.last_for('cities.sqlite3')
+		self.assertFalse(run.is_full)
+		self.assertEqual(run.watermark, '2024-06-01 00:00:00')
+
+	def test_full_flag_rescans(self):
+		self.cities.append(city_row(11, 'Old new city'))
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, self.cities)
+
+		self.assertIn('created=0', self.load('load_cities_data'))
+		self.assertIn('created=1', self.load('load_cities_data', full=True))
+
+	def test_incremental_child_links_to_unread_parent(self):
+		self.states.append(state_row(3, 'Tver', 'RU-TVE', parent_id=1, updated_at='2024-06-01 00:00:00'))
+		self.write_source('states.sqlite3', 'states', STATES_COLUMNS, self.states)
+
+		output = self.load('load_states_data')
+
+		self.assertIn('created=1, updated=0', output)
+		self.assertEqual(GeoNode.objects.get(iso_code='RU-TVE').parent.iso_code, 'RU-CFD')
+
+
+class ParallelImportTest(GeoImportTestCase):
+	def setUp(self):
+		super().setUp()
+		GeoCountryFactory(cca2='KZ')
+		self.write_source('states.sqlite3', 'states', STATES_COLUMNS, [
+			state_row(1, 'Moscow', 'RU-MOW'),
+			state_row(2, 'Almaty', 'KZ-ALA', country='KZ'),
+		])
+		self.load('load_states_data')
+
+	def test_workers_import_all_countries(self):
+		rows = [city_row(i, f'City {i}') for i in range(1, 21)]
+		rows += [city_row(i, f'City {i}', state_code='ALA', country='KZ') for i in range(21, 31)]
+		rows.append(city_row(31, 'City 1', updated_at='2025-01-01 00:00:00', population='9'))
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, rows)
+
+		output = self.load('load_cities_data', workers=2, batch_size=6)
+
+		self.assertIn('Разбор в 2 процессах, частей: 2', output)
+		self.assertIn('created=30, updated=1, skipped=0', output)
+		self.assertEqual(GeoCity.objects.filter(node__iso_code='RU-MOW').count(), 20)
+		self.assertEqual(GeoCity.objects.filter(node__iso_code='KZ-ALA').count(), 10)
+		self.assertEqual(GeoCity.objects.get(name_ru='City 1 RU').population, 9)
+
+	def test_worker_parse_error_stops_import(self):
+		rows = [city_row(1, 'City 1'), city_row(2, 'Broken', latitude='north')]
+		self.write_source('cities.sqlite3', 'cities', CITIES_COLUMNS, rows)
+
+		with self.assertRaisesMessage(ValueError, 'row id=2'):
+			self.load('load_cities_data', workers=2, stderr=io.StringIO())
+		self.assertFalse(GeoCity.objects.exists())
+
+
+class ParentLinksTest(GeoImportTestCase):
+	def states(self, regions):
+		rows = [state_row(1, 'Central', 'RU-CFD', level=None)]
+		for i in range(regions):
+			rows.append(state_row(100 + i, f'Region {i}', f'RU-R{i}', parent_id=1, level=None))
+			rows.append(state_row(1000 + i, f'District {i}', f'RU-D{i}', parent_id=100 + i, level=None))
+		self.write_source('states.sqlite3', 'states', STATES_COLUMNS, rows)
+
+	def test_parents_and_levels(self):
+		self.states(3)
+		self.load('load_states_data')
+
+		district = GeoNode.objects.get(iso_code='RU-D2')
+		self.assertEqual(district.parent.iso_code, 'RU-R2')
+		self.assertEqual(district.level, 2)
+		self.assertEqual(district.parent.level, 1)
+		self.assertEqual(GeoNode.objects.get(iso_code='RU-CFD').level, 0)
+
+	def test_parent_pass_cost_does_not_grow(self):
+		def import_queries(regions):
+			GeoNode.objects.all().delete()
+			GeoImportRun.objects.all().delete()
+			self.states(regions)
+			with CaptureQueriesContext(connection) as ctx:
+				self.load('load_states_data')
+			return len(ctx.captured_queries)
+
+		self.assertEqual(import_queries(5), import_queries(40))
+
+	def test_rerun_writes_nothing(self):
+		self.states(3)
+		self.load('load_states_data')
+
+		output = self.load('load_states_data', full=True)
+		self.assertIn('изменено узлов: 0', output)
+
+	def test_tree_levels_detects_cycle(self):
+		self.assertEqual(tree_levels({1: None, 2: 1, 3: 2}), {1: 0, 2: 1, 3: 2})
+		with self.assertRaises(CommandError):
+			tree_levels({1: 2, 2: 1})
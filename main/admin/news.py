@@ -93,13 +93,9 @@ class NewsInline( admin.TabularInline  ):
 
 @admin.register( NewsTag )
 class NewsTagAdmin( admin.ModelAdmin ):
-	list_display       = [ 'name', 'news_count', 'created_at' ]
+	list_display       = [ 'name', 'slug', 'news_count', 'created_at' ]
 	list_display_links = [ 'name' ]
 	list_filter        = [ 'created_at' ]
+	readonly_fields    = [ 'news_count' ]
 
 	inlines = [ NewsInline ]
-
-	def news_count( self, obj ):
-		return obj.news_set.count()
-
-	news_count.short_description = "Новостей"
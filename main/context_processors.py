@@ -1,3 +1,5 @@
+from django.utils.functional import SimpleLazyObject
+
 from Shaurmania.settings import DEBUG, COMPRESS_ENABLED, IS_HALLOWEEN, IS_NEW_YEAR
 
 
@@ -11,15 +13,9 @@ def feature_flags(request):
 
 
 def cart_meta(request):
-	from cart.models import Cart
-
-	if request.user.is_authenticated:
-		rows = Cart.objects.filter(user=request.user).values_list('quanity', flat=True)
-	else:
-		if not request.session.session_key:
-			request.session.save()
-		rows = Cart.objects.filter(session_key=request.session.session_key).values_list('quanity', flat=True)
+	from cart.middleware import get_request_cart
 
+	# Корзина читается только если шаблон действительно выводит счётчик
 	return {
-		'cart_count': sum(rows)
+		'cart_count': SimpleLazyObject(lambda: get_request_cart(request).count)
 	}
@@ -26,9 +26,9 @@ class NewsFactory( DjangoModelFactory ):
 
 	@classmethod
 	def _create( cls, model_class, *args, **kwargs ):
-		tags = kwargs.pop(
-			'tags', [NewsTagFactory() for _ in range( fake.random_int( 1, 3 ) )]
-		)
+		tags = kwargs.pop( 'tags', None )
+		if tags is None:
+			tags = [NewsTagFactory() for _ in range( fake.random_int( 1, 3 ) )]
 		news = super()._create( model_class, *args, **kwargs )
 
 		if tags:
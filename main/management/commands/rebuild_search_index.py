@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.search import get_search_backend
+
+
+class Command( BaseCommand ):
+	help = "Полная перестройка поискового индекса товаров"
+
+	def handle( self, *args, **options ):
+		backend = get_search_backend()
+		started = time.monotonic()
+
+		# setup() только создаёт хранилище, если его нет, — индекс заполняется один раз
+		backend.setup()
+		count = backend.rebuild()
+
+		self.stdout.write( self.style.SUCCESS(
+			f"{type( backend ).__name__}: проиндексировано товаров {count} за {time.monotonic() - started:.2f} с"
+		) )
@@ -0,0 +1,78 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+def fill_ratings(apps, schema_editor):
+    Shaurma = apps.get_model('main', 'Shaurma')
+
+    rows = Shaurma.objects.annotate(
+        new_count=models.Count('review'),
+        new_sum=models.Sum('review__stars', default=0),
+        **{f'new_{stars}': models.Count('review', filter=models.Q(review__stars=stars)) for stars in range(1, 6)},
+    ).filter(new_count__gt=0).values('id', 'new_count', 'new_sum', *(f'new_{stars}' for stars in range(1, 6)))
+
+    for row in rows:
+        Shaurma.objects.filter(pk=row['id']).update(
+            rating_count=row['new_count'],
+            rating_sum=row['new_sum'],
+            **{f'rating_{stars}': row[f'new_{stars}'] for stars in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_shaurma_is_featured_alter_shaurma_category'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['name', 'id'], 'verbose_name': 'отзыв', 'verbose_name_plural': 'отзывы'},
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 1★'),
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 2★'),
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 3★'),
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 4★'),
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок 5★'),
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Отзывов'),
+        ),
+        migrations.AddField(
+            model_name='shaurma',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['shaurma', '-date'], name='review_shaurma_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['name', 'id'], name='review_name_idx'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_shaurma_rating'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['-created_at', '-id'], name='location_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['is_shown', '-created_at', '-id'], name='news_shown_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-date', '-id'], name='review_date_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+def dedupe_slugs(apps, schema_editor):
+    NewsTag = apps.get_model('main', 'NewsTag')
+
+    # Повторный slug получает суффикс с id, чтобы уникальный индекс создался
+    seen = set()
+    for tag in NewsTag.objects.order_by('id').only('id', 'slug'):
+        if tag.slug in seen:
+            tag.slug = f'{tag.slug[:50]}-{tag.id}'
+            tag.save(update_fields=['slug'])
+        seen.add(tag.slug)
+
+
+def fill_news_count(apps, schema_editor):
+    NewsTag = apps.get_model('main', 'NewsTag')
+
+    for tag in NewsTag.objects.annotate(shown=models.Count('news', filter=models.Q(news__is_shown=True))):
+        NewsTag.objects.filter(pk=tag.pk).update(news_count=tag.shown)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_feed_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='newstag',
+            options={'ordering': ['name'], 'verbose_name': 'новостной тег', 'verbose_name_plural': 'новостные теги'},
+        ),
+        migrations.AddField(
+            model_name='newstag',
+            name='news_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Новостей'),
+        ),
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='newstag',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=60, unique=True, verbose_name='URL-адрес тега'),
+        ),
+        migrations.RunPython(fill_news_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+def dedupe_slugs(apps, schema_editor):
+    # Пустой или повторный slug получает суффикс с id, чтобы уникальные индексы создались
+    for name in ('Location', 'News', 'Shaurma', 'Stock'):
+        model = apps.get_model('main', name)
+        max_length = model._meta.get_field('slug').max_length
+
+        seen = set()
+        for obj in model.objects.order_by('id').only('id', 'slug'):
+            if not obj.slug or obj.slug in seen:
+                suffix = f'-{obj.id}'
+                obj.slug = f'{(obj.slug or name.lower())[:max_length - len(suffix)]}{suffix}'
+                obj.save(update_fields=['slug'])
+            seen.add(obj.slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_newstag_slug_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='location',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=70, unique=True, verbose_name='URL-адрес'),
+        ),
+        migrations.AlterField(
+            model_name='news',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=110, unique=True, verbose_name='URL-адрес'),
+        ),
+        migrations.AlterField(
+            model_name='shaurma',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=70, unique=True, verbose_name='URL-адрес'),
+        ),
+        migrations.AlterField(
+            model_name='stock',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=70, unique=True, verbose_name='URL-адрес'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models as m
-from slugify import slugify
+
+from main.slugs import unique_slug
 
 
 TIME_VARIANTS = {
@@ -10,7 +11,7 @@ TIME_VARIANTS = {
 
 class Location( m.Model ):
 	name        = m.CharField( max_length = 60, verbose_name = 'Название' )
-	slug        = m.SlugField( max_length = 70, blank = True, verbose_name = "URL-адрес" )
+	slug        = m.SlugField( max_length = 70, unique = True, blank = True, verbose_name = "URL-адрес" )
 	description = m.TextField( max_length = 600, verbose_name = 'Описание' )
 	planet      = m.CharField( max_length = 60, default = 'Земля', verbose_name = 'Планета' )
 	country     = m.CharField( max_length = 60, default = 'Россия', verbose_name = 'Страна' )
@@ -26,7 +27,7 @@ class Location( m.Model ):
 
 	def save( self, *args, **kwargs ):
 		if not self.slug:
-			self.slug = slugify( self.name )
+			self.slug = unique_slug( self, self.name )
 		super().save( *args, **kwargs )
 
 	def __str__( self ):
@@ -36,3 +37,7 @@ class Location( m.Model ):
 		verbose_name = 'заведениe'
 		verbose_name_plural = 'заведения'
 		ordering = ['address']
+		indexes = [
+			# Лента заведений: курсор по ( created_at, id )
+			m.Index( fields = [ '-created_at', '-id' ], name = 'location_created_idx' ),
+		]
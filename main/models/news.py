@@ -1,12 +1,14 @@
 from django.db import models as m
-from slugify import slugify
+from django.db.models.functions import Coalesce
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
+from main.slugs import unique_slug
+
 
 class News( m.Model ):
 	title        = m.CharField( max_length = 100, unique = True, verbose_name = 'Заголовок' )
-	slug         = m.SlugField( max_length = 110, blank = True, verbose_name = 'URL-адрес' )
+	slug         = m.SlugField( max_length = 110, unique = True, blank = True, verbose_name = 'URL-адрес' )
 	short_text   = m.TextField( max_length = 200, blank = True, verbose_name = 'Краткое описание' )
 	rich_content = m.TextField( null = True, blank = True, verbose_name = 'Текст новости' )
 	picture      = m.ImageField( upload_to = 'news_images', blank=True, null=True, verbose_name = 'Изображение 16 на 9' )
@@ -36,7 +38,7 @@ class News( m.Model ):
 
 	def save( self, *args, **kwargs ):
 		if not self.slug:
-			self.slug = slugify( self.title )
+			self.slug = unique_slug( self, self.title )
 		super().save( *args, **kwargs )
 
 		if self.picture:
@@ -51,16 +53,37 @@ class News( m.Model ):
 		verbose_name = 'новость'
 		verbose_name_plural = 'новости'
 		ordering = ['-created_at', 'title']
+		indexes = [
+			# Лента новостей: курсор по ( created_at, id ) среди показываемых
+			m.Index( fields = [ 'is_shown', '-created_at', '-id' ], name = 'news_shown_created_idx' ),
+		]
+
+
+class NewsTagManager( m.Manager ):
+	def refresh_counts( self, tags ) -> None:
+		"""Пересчитывает news_count тегов ( id или QuerySet ) одним UPDATE с подзапросом."""
+		shown = (
+			News.tags.through.objects
+			.filter( newstag_id = m.OuterRef( 'pk' ), news__is_shown = True )
+			.values( 'newstag_id' )
+			.annotate( count = m.Count( '*' ) )
+			.values( 'count' )
+		)
+		self.filter( pk__in = tags ).update( news_count = Coalesce( m.Subquery( shown ), 0 ) )
 
 
 class NewsTag( m.Model ):
 	name       = m.CharField( max_length = 50, unique = True, verbose_name = 'Название тега' )
-	slug       = m.SlugField( max_length = 60, blank = True, verbose_name = 'URL-адрес тега' )
+	slug       = m.SlugField( max_length = 60, unique = True, blank = True, verbose_name = 'URL-адрес тега' )
+	# Показываемые новости с тегом — для облака тегов без COUNT на каждый тег ( main.signals )
+	news_count = m.PositiveIntegerField( default = 0, editable = False, verbose_name = 'Новостей' )
 	created_at = m.DateTimeField( auto_now_add = True, verbose_name = 'Дата создания' )
 
+	objects = NewsTagManager()
+
 	def save( self, *args, **kwargs ):
 		if not self.slug:
-			self.slug = slugify( self.name )
+			self.slug = unique_slug( self, self.name )
 		super().save( *args, **kwargs )
 
 	def __str__( self ):
@@ -69,3 +92,4 @@ class NewsTag( m.Model ):
 	class Meta:
 		verbose_name = 'новостной тег'
 		verbose_name_plural = 'новостные теги'
+		ordering = [ 'name' ]
@@ -1,6 +1,8 @@
-from django.db import models as m
+from django.db import models as m, transaction
 from django.core.validators import MinValueValidator,MaxValueValidator
 
+from .shaurma import Shaurma
+
 
 class Review( m.Model ):
     name    = m.CharField( max_length = 60,  verbose_name = 'Имя' )
@@ -9,10 +11,26 @@ class Review( m.Model ):
     shaurma = m.ForeignKey( 'Shaurma', on_delete = m.SET_NULL, null = True, blank = True, verbose_name = 'Шаурма' )
     date    = m.DateTimeField( auto_now_add = True, verbose_name = 'Время записи' )
 
+    def save( self, *args, **kwargs ):
+        # Итоги оценок товара меняются в той же транзакции, что и отзыв
+        with transaction.atomic():
+            if self._state.adding:
+                super().save( *args, **kwargs )
+                Shaurma.objects.add_rating( self.shaurma_id, self.stars )
+                return
+
+            previous = Review.objects.filter( pk = self.pk ).values_list( 'shaurma_id', flat = True ).first()
+            super().save( *args, **kwargs )
+            Shaurma.objects.refresh_ratings( { previous, self.shaurma_id } )
+
     def __str__(self):
         return f'Отзыв от {self.name} ( {self.stars} / 5 )'
 
     class Meta:
         verbose_name = 'отзыв'
         verbose_name_plural = 'отзывы'
-        ordering = [ 'name' ]
+        ordering = [ 'name', 'id' ]
+        indexes = [
+            m.Index( fields = [ 'shaurma', '-date' ], name = 'review_shaurma_date_idx' ),
+            m.Index( fields = [ '-date', '-id' ], name = 'review_date_idx' ),
+        ]
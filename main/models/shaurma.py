@@ -1,12 +1,47 @@
 from django.db import models as m
-from slugify import slugify
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
+from main.slugs import unique_slug
+
+
+RATING_STARS = ( 5, 4, 3, 2, 1 )
+
+
+class ShaurmaManager( m.Manager ):
+    def add_rating( self, shaurma_id: int | None, stars: int, sign: int = 1 ) -> None:
+        """Прибавляет ( sign = -1 — вычитает ) одну оценку к итогам товара одним UPDATE."""
+        if shaurma_id is None:
+            return
+        if stars not in RATING_STARS:
+            self.refresh_ratings( [ shaurma_id ] )
+            return
+
+        self.filter( pk = shaurma_id ).update(
+            rating_count = m.F( 'rating_count' ) + sign,
+            rating_sum   = m.F( 'rating_sum' ) + sign * stars,
+            **{ f'rating_{stars}': m.F( f'rating_{stars}' ) + sign },
+        )
+
+    def refresh_ratings( self, ids ) -> None:
+        """Пересчитывает итоги оценок товаров по их отзывам ( после правки отзыва )."""
+        items = self.filter( pk__in = [ pk for pk in ids if pk is not None ] ).annotate(
+            new_count = m.Count( 'review' ),
+            new_sum   = m.Sum( 'review__stars', default = 0 ),
+            **{ f'new_{stars}': m.Count( 'review', filter = m.Q( review__stars = stars ) ) for stars in RATING_STARS },
+        ).only( 'id' )
+
+        for item in items:
+            self.filter( pk = item.pk ).update(
+                rating_count = item.new_count,
+                rating_sum   = item.new_sum,
+                **{ f'rating_{stars}': getattr( item, f'new_{stars}' ) for stars in RATING_STARS },
+            )
+
 
 class Shaurma( m.Model ):
     name          = m.CharField( max_length = 60, unique = True, verbose_name = 'Название' )
-    slug          = m.SlugField( max_length = 70, blank = True, verbose_name = "URL-адрес" )
+    slug          = m.SlugField( max_length = 70, unique = True, blank = True, verbose_name = "URL-адрес" )
     category      = m.ForeignKey( 'ShaurmaCategory', on_delete = m.SET_NULL,
                                   null = True, blank = True, related_name = 'shaurmas',
                                   verbose_name = 'Категория' )
@@ -35,12 +70,34 @@ class Shaurma( m.Model ):
     carbohydrates = m.FloatField( default = 0, verbose_name = "Углеводы (г)" )
     is_available  = m.BooleanField( default = True, verbose_name = "Доступна для заказа" )
     is_featured   = m.BooleanField( default = False, verbose_name = "Показывать на главной" )
+    # Итоги отзывов: обновляются вместе с отзывом ( Review.save, main.signals ), страница товара не агрегирует
+    rating_count  = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Отзывов" )
+    rating_sum    = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Сумма оценок" )
+    rating_1      = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Оценок 1★" )
+    rating_2      = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Оценок 2★" )
+    rating_3      = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Оценок 3★" )
+    rating_4      = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Оценок 4★" )
+    rating_5      = m.PositiveIntegerField( default = 0, editable = False, verbose_name = "Оценок 5★" )
     created_at    = m.DateTimeField( auto_now_add = True, verbose_name = "Дата создания" )
     updated_at    = m.DateTimeField( auto_now = True, verbose_name = "Дата обновления" )
 
+    objects = ShaurmaManager()
+
+    @property
+    def rating( self ) -> float | None:
+        return round( self.rating_sum / self.rating_count, 1 ) if self.rating_count else None
+
+    @property
+    def rating_histogram( self ) -> list[tuple[int, int, int]]:
+        """( звёзды, отзывов, процент ) от 5 до 1 звезды."""
+        return [
+            ( stars, count, round( 100 * count / self.rating_count ) if self.rating_count else 0 )
+            for stars, count in ( ( stars, getattr( self, f'rating_{stars}' ) ) for stars in RATING_STARS )
+        ]
+
     def save( self, *args, **kwargs ):
         if not self.slug:
-            self.slug = slugify( self.name )
+            self.slug = unique_slug( self, self.name )
         super().save( *args, **kwargs )
 
         if self.picture:
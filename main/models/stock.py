@@ -1,9 +1,10 @@
 from django.db import models as m
-from slugify import slugify
+
+from main.slugs import unique_slug
 
 
 class Stock( m.Model ):
-	slug        = m.SlugField( max_length = 70, blank = True, verbose_name = "URL-адрес" )
+	slug        = m.SlugField( max_length = 70, unique = True, blank = True, verbose_name = "URL-адрес" )
 	name        = m.CharField( max_length = 60, verbose_name = 'Название' )
 	short_text  = m.CharField( max_length = 150, blank = True, verbose_name = 'Краткое описание' )
 	description = m.TextField( max_length = 1000, blank = True, verbose_name = 'Описание' )
@@ -16,7 +17,7 @@ class Stock( m.Model ):
 
 	def save( self, *args, **kwargs ):
 		if not self.slug:
-			self.slug = slugify( self.name )
+			self.slug = unique_slug( self, self.name )
 		super().save( *args, **kwargs )
 
 	def __str__( self ):
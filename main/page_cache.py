@@ -0,0 +1,52 @@
+import time
+
+from django.core.cache import cache
+
+from cart.models import ShaurmaStats
+from main.models import Location, News, NewsTag, Review, Shaurma, ShaurmaCategory, ShaurmaImage, Stock
+
+
+# Какие модели выводит кэшируемый фрагмент каждой страницы
+PAGE_MODELS = {
+	'index'    : ( Shaurma, ShaurmaStats ),
+	'catalog'  : ( Shaurma, ShaurmaCategory ),
+	'product'  : ( Shaurma, ShaurmaCategory, ShaurmaImage, Review ),
+	'stocks'   : ( Stock, ),
+	'locations': ( Location, ),
+	'news'     : ( News, NewsTag ),
+}
+
+VERSION_KEY = 'page_cache:version:{}'
+
+
+def _version_key( model ) -> str:
+	return VERSION_KEY.format( model._meta.label_lower )
+
+
+def model_versions( *models ) -> str:
+	"""
+	Строка версий моделей: меняется при любом сохранении / удалении их объектов ( main.signals ).
+	Хранится в общем кэше, поэтому сброс виден всем процессам.
+	"""
+	keys = [ _version_key( model ) for model in models ]
+	versions = cache.get_many( keys )
+
+	for key in keys:
+		if key not in versions:
+			versions[ key ] = time.time_ns()
+			cache.add( key, versions[ key ], None )
+
+	return '-'.join( str( versions[ key ] ) for key in keys )
+
+
+def page_versions( page: str ) -> str:
+	"""Версии моделей страницы для ключа фрагмента: старые фрагменты просто истекают по таймауту."""
+	return model_versions( *PAGE_MODELS[ page ] )
+
+
+def bump_version( model ) -> None:
+	cache.set( _version_key( model ), time.time_ns(), None )
+
+
+def cached_models() -> set:
+	return { model for models in PAGE_MODELS.values() for model in models }
@@ -0,0 +1,103 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+NEXT, PREVIOUS = 'n', 'p'
+
+
+class CursorPage:
+	"""Страница ленты: строки и непрозрачные курсоры соседних страниц ( None — страницы нет )."""
+
+	def __init__( self, object_list: list, cursor: str, next_cursor: str | None, previous_cursor: str | None ):
+		self.object_list = object_list
+		self.cursor = cursor
+		self.next_cursor = next_cursor
+		self.previous_cursor = previous_cursor
+
+	def has_next( self ) -> bool:
+		return self.next_cursor is not None
+
+	def has_previous( self ) -> bool:
+		return self.previous_cursor is not None
+
+	def __iter__( self ):
+		return iter( self.object_list )
+
+	def __len__( self ) -> int:
+		return len( self.object_list )
+
+
+class CursorPaginator:
+	"""
+	Постраничный вывод по ключу ( keyset ): следующая страница — строки после последней
+	по полям сортировки, без COUNT(*) и OFFSET, поэтому глубокие страницы не медленнее первой.
+	Последнее поле сортировки должно быть уникальным ( id ), по полям нужен индекс.
+	"""
+
+	def __init__( self, queryset, per_page: int, ordering: tuple = ( '-created_at', '-id' ) ):
+		self.queryset = queryset
+		self.per_page = per_page
+		self.ordering = ordering
+		self.fields = [ queryset.model._meta.get_field( name.lstrip( '-' ) ) for name in ordering ]
+
+	def _encode( self, row, direction: str ) -> str:
+		# value_to_string сохраняет микросекунды: ключ должен совпасть со значением в БД точно
+		values = [ field.value_to_string( row ) for field in self.fields ]
+		data = json.dumps( [ direction, *values ] ).encode()
+		return base64.urlsafe_b64encode( data ).decode().rstrip( '=' )
+
+	def _decode( self, cursor: str ) -> tuple[str, list]:
+		try:
+			direction, *values = json.loads( base64.urlsafe_b64decode( cursor + '=' * ( -len( cursor ) % 4 ) ) )
+			if direction not in ( NEXT, PREVIOUS ) or len( values ) != len( self.fields ):
+				raise ValueError( cursor )
+			return direction, [ field.to_python( value ) for field, value in zip( self.fields, values ) ]
+		except ( ValueError, TypeError, ValidationError ) as e:
+			raise ValueError( f'Некорректный курсор: {cursor!r}' ) from e
+
+	def _beyond( self, values: list, backwards: bool ) -> Q:
+		"""Строки строго после ( backwards — до ) ключа values в порядке сортировки."""
+		condition = Q()
+		for i, ( name, field ) in enumerate( zip( self.ordering, self.fields ) ):
+			descending = name.startswith( '-' ) != backwards
+			step = Q( **{ f'{field.attname}__{"lt" if descending else "gt"}': values[ i ] } )
+			for previous, value in zip( self.fields[ :i ], values ):
+				step &= Q( **{ previous.attname: value } )
+			condition |= step
+		return condition
+
+	def _flipped( self ) -> list[str]:
+		return [ name[ 1: ] if name.startswith( '-' ) else f'-{name}' for name in self.ordering ]
+
+	def page( self, cursor: str | None ) -> CursorPage:
+		"""Страница после / перед курсором; пустой или испорченный курсор — первая страница."""
+		try:
+			direction, values = self._decode( cursor ) if cursor else ( None, None )
+		except ValueError:
+			direction, values = None, None
+
+		if direction == PREVIOUS:
+			rows = list( self.queryset.filter( self._beyond( values, backwards = True ) ).order_by( *self._flipped() )[ :self.per_page + 1 ] )
+			if len( rows ) <= self.per_page:
+				# Дошли до начала ленты — отдаём полную первую страницу
+				return self.page( None )
+			rows = rows[ :self.per_page ][ ::-1 ]
+			return CursorPage( rows, cursor, self._encode( rows[ -1 ], NEXT ), self._encode( rows[ 0 ], PREVIOUS ) )
+
+		queryset = self.queryset.order_by( *self.ordering )
+		if direction == NEXT:
+			queryset = queryset.filter( self._beyond( values, backwards = False ) )
+
+		rows = list( queryset[ :self.per_page + 1 ] )
+		has_next = len( rows ) > self.per_page
+		rows = rows[ :self.per_page ]
+
+		return CursorPage(
+			rows,
+			cursor if direction else '',
+			self._encode( rows[ -1 ], NEXT ) if has_next else None,
+			self._encode( rows[ 0 ], PREVIOUS ) if direction and rows else None,
+		)
@@ -0,0 +1,10 @@
+from functools import cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@cache
+def get_search_backend():
+	"""Поисковый бэкенд из настройки SEARCH_BACKEND ( один экземпляр на процесс )."""
+	return import_string( settings.SEARCH_BACKEND )()
@@ -0,0 +1,146 @@
+from abc import ABC, abstractmethod
+
+from django.db import connections, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from main.models import Shaurma
+from main.search.text import stems
+
+
+# Поля товара, по которым идёт поиск, и их вес в ранжировании ( название важнее всего )
+SEARCH_FIELDS = {
+	'name'       : 10.0,
+	'compound'   : 3.0,
+	'short_text' : 2.0,
+	'description': 1.0,
+}
+
+
+class BaseSearchBackend( ABC ):
+	"""
+	Интерфейс поискового индекса товаров. search() возвращает id Shaurma
+	в порядке релевантности, update()/remove() вызываются сигналами модели.
+	"""
+
+	def __init__( self, using: str = 'default' ):
+		self.using = using
+
+	def setup( self ) -> bool:
+		"""Создаёт пустое хранилище индекса, если его нет. True — создано, индекс нужно заполнить rebuild()."""
+		return False
+
+	@abstractmethod
+	def search( self, query: str, limit: int = 50 ) -> list[int]:
+		"""Переопределить в подклассе: id товаров по запросу, самые релевантные первыми"""
+		pass
+
+	def update( self, shaurma: Shaurma ) -> None:
+		pass
+
+	def remove( self, pk: int ) -> None:
+		pass
+
+	def rebuild( self ) -> int:
+		return Shaurma.objects.using( self.using ).count()
+
+
+class SimpleSearchBackend( BaseSearchBackend ):
+	"""Без отдельного индекса: icontains по основам слов, совпадения в названии — выше."""
+
+	def search( self, query: str, limit: int = 50 ) -> list[int]:
+		terms = stems( query )
+		if not terms:
+			return []
+
+		matches = Q()
+		for term in terms:
+			matches &= Q( *( Q( **{ f'{field}__icontains': term } ) for field in SEARCH_FIELDS ), _connector = Q.OR )
+
+		in_name = Q( *( Q( name__icontains = term ) for term in terms ) )
+		return list(
+			Shaurma.objects.using( self.using )
+			.filter( matches )
+			.annotate( in_name = Case( When( in_name, then = Value( 0 ) ), default = Value( 1 ), output_field = IntegerField() ) )
+			.order_by( 'in_name', 'name' )
+			.values_list( 'id', flat = True )[ :limit ]
+		)
+
+
+class Fts5SearchBackend( BaseSearchBackend ):
+	"""
+	Виртуальная таблица SQLite FTS5 с rowid = id товара. В индекс пишутся основы слов
+	( text.stems ), поэтому «шаурмой» находит «шаурма»; каждая основа запроса ищется как префикс.
+	"""
+	TABLE = 'main_shaurma_search'
+	BATCH_SIZE = 500
+
+	@property
+	def connection( self ):
+		return connections[ self.using ]
+
+	@property
+	def insert_sql( self ) -> str:
+		return f'INSERT INTO {self.TABLE} ( rowid, {", ".join( SEARCH_FIELDS )} ) VALUES ( %s{", %s" * len( SEARCH_FIELDS )} )'
+
+	def setup( self ) -> bool:
+		if self.connection.vendor != 'sqlite':
+			return False
+
+		with self.connection.cursor() as cursor:
+			if self.TABLE in self.connection.introspection.table_names( cursor ):
+				return False
+			cursor.execute(
+				f'CREATE VIRTUAL TABLE {self.TABLE} USING fts5( '
+				f'{", ".join( SEARCH_FIELDS )}, tokenize = "unicode61 remove_diacritics 2" )'
+			)
+		return True
+
+	@staticmethod
+	def _row( shaurma: Shaurma ) -> list:
+		return [ shaurma.pk, *( ' '.join( stems( getattr( shaurma, field ) or '' ) ) for field in SEARCH_FIELDS ) ]
+
+	@staticmethod
+	def _match( query: str ) -> str:
+		# Каждая основа в кавычках ( экранирование синтаксиса FTS5 ) и как префикс: «шаур» → «"шаур"*»
+		return ' AND '.join( f'"{term}"*' for term in stems( query ) )
+
+	def search( self, query: str, limit: int = 50 ) -> list[int]:
+		match = self._match( query )
+		if not match:
+			return []
+
+		weights = ', '.join( str( weight ) for weight in SEARCH_FIELDS.values() )
+		with self.connection.cursor() as cursor:
+			cursor.execute(
+				f'SELECT rowid FROM {self.TABLE} WHERE {self.TABLE} MATCH %s '
+				f'ORDER BY bm25( {self.TABLE}, {weights} ) LIMIT %s',
+				[ match, limit ],
+			)
+			return [ row[ 0 ] for row in cursor.fetchall() ]
+
+	def update( self, shaurma: Shaurma ) -> None:
+		with self.connection.cursor() as cursor:
+			cursor.execute( f'DELETE FROM {self.TABLE} WHERE rowid = %s', [ shaurma.pk ] )
+			cursor.execute( self.insert_sql, self._row( shaurma ) )
+
+	def remove( self, pk: int ) -> None:
+		with self.connection.cursor() as cursor:
+			cursor.execute( f'DELETE FROM {self.TABLE} WHERE rowid = %s', [ pk ] )
+
+	def rebuild( self ) -> int:
+		items = Shaurma.objects.using( self.using ).only( 'id', *SEARCH_FIELDS ).iterator( chunk_size = self.BATCH_SIZE )
+
+		count = 0
+		batch = []
+		with transaction.atomic( using = self.using ), self.connection.cursor() as cursor:
+			cursor.execute( f'DELETE FROM {self.TABLE}' )
+			for shaurma in items:
+				batch.append( self._row( shaurma ) )
+				if len( batch ) == self.BATCH_SIZE:
+					cursor.executemany( self.insert_sql, batch )
+					count += len( batch )
+					batch = []
+			if batch:
+				cursor.executemany( self.insert_sql, batch )
+				count += len( batch )
+		return count
@@ -0,0 +1,142 @@
+import threading
+
+from django.urls import reverse
+
+from main.models import Shaurma, ShaurmaCategory
+from main.page_cache import model_versions
+from main.search.text import tokenize
+
+
+# Раскладка клавиатуры: «ifehvf» — это «шаурма», набранная в английской раскладке
+EN_KEYS = 'qwertyuiop[]asdfghjkl;\'zxcvbnm,.`'
+RU_KEYS = 'йцукенгшщзхъфывапролджэячсмитьбюё'
+EN_TO_RU = str.maketrans( EN_KEYS + EN_KEYS.upper(), RU_KEYS + RU_KEYS.upper() )
+RU_TO_EN = str.maketrans( RU_KEYS + RU_KEYS.upper(), EN_KEYS + EN_KEYS.upper() )
+
+# Слова короче этого ищутся только точным префиксом: с опечаткой под них подходит полкаталога
+FUZZY_MIN_LENGTH = 3
+MAX_DISTANCE = 1
+
+# Приоритет совпадения: по названию товара выше, чем по названию его категории
+NAME, CATEGORY = 0, 1
+
+
+class _Node:
+	__slots__ = ( 'children', 'below' )
+
+	def __init__( self ):
+		self.children = {}
+		# { номер товара: лучший приоритет } для всех слов, проходящих через узел
+		self.below = {}
+
+
+def layout_variants( query: str ) -> list[str]:
+	"""Запрос как есть и в другой раскладке ( в обе стороны ), без повторов."""
+	return list( dict.fromkeys( ( query, query.translate( EN_TO_RU ), query.translate( RU_TO_EN ) ) ) )
+
+
+class SuggestIndex:
+	"""
+	Префиксное дерево по словам названий доступных товаров и их категорий в памяти процесса.
+	Перестраивается при смене версий Shaurma / ShaurmaCategory ( main.page_cache ),
+	поиск допускает одну опечатку и ввод в неверной раскладке.
+	"""
+
+	def __init__( self ):
+		self._lock = threading.Lock()
+		self._root = None
+		self._entries = []
+		self._version = None
+
+	def _build( self ) -> tuple[_Node, list]:
+		root = _Node()
+		entries = []
+		items = (
+			Shaurma.objects
+			.filter( is_available = True )
+			.select_related( 'category' )
+			.only( 'id', 'name', 'slug', 'category__name' )
+		)
+		for shaurma in items:
+			index = len( entries )
+			entries.append( {
+				'name': shaurma.name,
+				'slug': shaurma.slug,
+				'url' : reverse( 'product', kwargs = { 'slug': shaurma.slug } ),
+			} )
+			words = [ ( word, NAME ) for word in tokenize( shaurma.name ) ]
+			if shaurma.category:
+				words += [ ( word, CATEGORY ) for word in tokenize( shaurma.category.name ) ]
+
+			for word, priority in words:
+				node = root
+				for ch in word:
+					node = node.children.setdefault( ch, _Node() )
+					node.below[ index ] = min( node.below.get( index, priority ), priority )
+		return root, entries
+
+	def _get( self ) -> tuple[_Node, list]:
+		version = model_versions( Shaurma, ShaurmaCategory )
+		with self._lock:
+			if self._root is None or self._version != version:
+				self._root, self._entries = self._build()
+				self._version = version
+			return self._root, self._entries
+
+	@staticmethod
+	def _match_word( root: _Node, word: str ) -> dict:
+		"""{ номер товара: ( расстояние, приоритет ) } для слов, начинающихся с word с точностью до опечатки."""
+		max_distance = MAX_DISTANCE if len( word ) >= FUZZY_MIN_LENGTH else 0
+		found = {}
+
+		def collect( node: _Node, distance: int ) -> None:
+			for index, priority in node.below.items():
+				found[ index ] = min( found.get( index, ( distance, priority ) ), ( distance, priority ) )
+
+		# Обход дерева со строкой расстояний Левенштейна: узел подходит, если его префикс
+		# отличается от word не больше чем на max_distance правок
+		def walk( node: _Node, ch: str, prev_row: list ) -> None:
+			row = [ prev_row[ 0 ] + 1 ]
+			for i, query_ch in enumerate( word, 1 ):
+				row.append( min( row[ i - 1 ] + 1, prev_row[ i ] + 1, prev_row[ i - 1 ] + ( query_ch != ch ) ) )
+
+			if row[ -1 ] <= max_distance:
+				collect( node, row[ -1 ] )
+			if min( row ) <= max_distance:
+				for next_ch, child in node.children.items():
+					walk( child, next_ch, row )
+
+		first_row = list( range( len( word ) + 1 ) )
+		for ch, child in root.children.items():
+			walk( child, ch, first_row )
+		return found
+
+	def suggest( self, query: str, limit: int = 8 ) -> list[dict]:
+		root, entries = self._get()
+
+		scores = {}
+		for variant in layout_variants( query ):
+			words = tokenize( variant )
+			if not words:
+				continue
+
+			# Каждое слово запроса должно найтись у товара: пересечение совпадений по словам
+			matched = None
+			for word in words:
+				found = self._match_word( root, word )
+				if matched is None:
+					matched = { index: [ distance, priority ] for index, ( distance, priority ) in found.items() }
+					continue
+				matched = {
+					index: [ score[ 0 ] + found[ index ][ 0 ], max( score[ 1 ], found[ index ][ 1 ] ) ]
+					for index, score in matched.items() if index in found
+				}
+
+			for index, score in matched.items():
+				scores[ index ] = min( scores.get( index, tuple( score ) ), tuple( score ) )
+
+		ranked = sorted( scores, key = lambda index: ( *scores[ index ], entries[ index ][ 'name' ] ) )
+		return [ entries[ index ] for index in ranked[ :limit ] ]
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,102 @@
+import re
+
+
+WORD_RE = re.compile( r'\w+' )
+
+VOWELS = 'аеиоуыэюя'
+
+# Окончания русского стеммера Snowball (упрощённо), длинные — первыми
+PERFECTIVE_GERUND_AFTER_A = ( 'вшись', 'вши', 'в' )
+PERFECTIVE_GERUND = ( 'ывшись', 'ившись', 'ывши', 'ивши', 'ыв', 'ив' )
+REFLEXIVE = ( 'ся', 'сь' )
+ADJECTIVE = (
+	'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый', 'ой',
+	'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE_AFTER_A = ( 'ем', 'нн', 'вш', 'ющ', 'щ' )
+PARTICIPLE = ( 'ивш', 'ывш', 'ующ' )
+VERB_AFTER_A = ( 'ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н' )
+VERB = (
+	'ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено', 'ует', 'уют', 'ены', 'ить', 'ыть',
+	'ишь', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю',
+)
+NOUN = (
+	'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям',
+	'ем', 'ам', 'ом', 'ах', 'ях', 'ию', 'ью', 'ия', 'ья', 'я', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю',
+)
+SUPERLATIVE = ( 'ейше', 'ейш' )
+DERIVATIONAL = ( 'ость', 'ост' )
+
+
+def normalize( text: str ) -> str:
+	return text.casefold().replace( 'ё', 'е' )
+
+
+def _region( word: str, start: int = 0 ) -> int:
+	"""Начало области после первой пары «гласная + согласная» (R1/R2 у Snowball)."""
+	for i in range( start + 1, len( word ) ):
+		if word[ i ] not in VOWELS and word[ i - 1 ] in VOWELS:
+			return i + 1
+	return len( word )
+
+
+def _strip( rv: str, endings: tuple, after_a: bool = False ) -> str | None:
+	for ending in endings:
+		if rv.endswith( ending ):
+			stem = rv[ :-len( ending ) ]
+			if after_a and not stem.endswith( ( 'а', 'я' ) ):
+				continue
+			return stem
+	return None
+
+
+def stem_ru( word: str ) -> str:
+	"""Упрощённый русский стеммер Snowball: отрезает окончание в области после первой гласной."""
+	first_vowel = next( ( i for i, ch in enumerate( word ) if ch in VOWELS ), None )
+	if first_vowel is None:
+		return word
+
+	head, rv = word[ :first_vowel + 1 ], word[ first_vowel + 1: ]
+
+	# Шаг 1: деепричастие, иначе возвратность + прилагательное / глагол / существительное
+	stem = _strip( rv, PERFECTIVE_GERUND ) or _strip( rv, PERFECTIVE_GERUND_AFTER_A, after_a = True )
+	if stem is None:
+		rv = _strip( rv, REFLEXIVE ) or rv
+		stem = _strip( rv, ADJECTIVE )
+		if stem is not None:
+			stem = _strip( stem, PARTICIPLE ) or _strip( stem, PARTICIPLE_AFTER_A, after_a = True ) or stem
+		else:
+			stem = _strip( rv, VERB ) or _strip( rv, VERB_AFTER_A, after_a = True )
+			if stem is None:
+				stem = _strip( rv, NOUN )
+	rv = rv if stem is None else stem
+
+	# Шаг 2–4: «и», словообразовательные суффиксы в R2, превосходная степень, «нн» и «ь»
+	rv = rv.removesuffix( 'и' )
+
+	word = head + rv
+	r2 = _region( word, _region( word ) )
+	for ending in DERIVATIONAL:
+		if word.endswith( ending ) and len( word ) - len( ending ) >= r2:
+			word = word[ :-len( ending ) ]
+			break
+
+	word = _strip( word, SUPERLATIVE ) or word
+	if word.endswith( 'нн' ):
+		return word[ :-1 ]
+	return word.removesuffix( 'ь' )
+
+
+def stem( token: str ) -> str:
+	# Латиницу и короткие слова не трогаем: у них нечего отрезать без потери смысла
+	if len( token ) <= 3 or not any( 'а' <= ch <= 'я' for ch in token ):
+		return token
+	return stem_ru( token )
+
+
+def tokenize( text: str ) -> list[str]:
+	return WORD_RE.findall( normalize( text ) )
+
+
+def stems( text: str ) -> list[str]:
+	return [ stem( token ) for token in tokenize( text ) ]
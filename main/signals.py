@@ -0,0 +1,85 @@
+from django.apps import apps
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+
+from main.models import News, NewsTag, Review, Shaurma
+from main.page_cache import bump_version, cached_models
+from main.search import get_search_backend
+
+
+def invalidate_page_cache(sender, **kwargs):
+	# Новая версия модели — все фрагменты, которые её выводят, получают новый ключ
+	bump_version(sender)
+
+
+def invalidate_news_tags(sender, action, **kwargs):
+	if action.startswith('post_'):
+		bump_version(News)
+
+
+def recount_tags_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+	# tag.news_set.* — меняется только этот тег
+	if reverse:
+		if action.startswith('post_'):
+			NewsTag.objects.refresh_counts([instance.pk])
+		return
+
+	# news.tags.clear() не передаёт pk_set — запоминаем теги до очистки
+	if action == 'pre_clear':
+		instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+	elif action == 'post_clear':
+		NewsTag.objects.refresh_counts(instance.__dict__.pop('_cleared_tag_ids', []))
+	elif action in ('post_add', 'post_remove'):
+		NewsTag.objects.refresh_counts(pk_set)
+
+
+def recount_tags_on_save(sender, instance, created, **kwargs):
+	# is_shown мог измениться; у новой новости тегов ещё нет
+	if not created:
+		NewsTag.objects.refresh_counts(News.tags.through.objects.filter(news_id=instance.pk).values('newstag_id'))
+
+
+def remember_news_tags(sender, instance, **kwargs):
+	# После удаления строки связи уже стёрты каскадом
+	instance._deleted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+def recount_tags_on_delete(sender, instance, **kwargs):
+	NewsTag.objects.refresh_counts(instance.__dict__.pop('_deleted_tag_ids', []))
+
+
+def unrate_shaurma(sender, instance, **kwargs):
+	# post_delete приходит внутри транзакции удаления, в том числе для QuerySet.delete()
+	Shaurma.objects.add_rating(instance.shaurma_id, instance.stars, sign=-1)
+
+
+def index_shaurma(sender, instance, **kwargs):
+	get_search_backend().update(instance)
+
+
+def unindex_shaurma(sender, instance, **kwargs):
+	get_search_backend().remove(instance.pk)
+
+
+def setup_search_index(sender, **kwargs):
+	# Заполняем только что созданный индекс; существующий поддерживают сигналы товара
+	backend = get_search_backend()
+	if backend.setup():
+		backend.rebuild()
+
+
+for model in cached_models():
+	post_save.connect(invalidate_page_cache, sender=model, dispatch_uid=f'page_cache_save_{model._meta.label_lower}')
+	post_delete.connect(invalidate_page_cache, sender=model, dispatch_uid=f'page_cache_delete_{model._meta.label_lower}')
+
+m2m_changed.connect(invalidate_news_tags, sender=News.tags.through, dispatch_uid='page_cache_news_tags')
+
+m2m_changed.connect(recount_tags_on_change, sender=News.tags.through, dispatch_uid='news_tag_count_m2m')
+post_save.connect(recount_tags_on_save, sender=News, dispatch_uid='news_tag_count_save')
+pre_delete.connect(remember_news_tags, sender=News, dispatch_uid='news_tag_count_pre_delete')
+post_delete.connect(recount_tags_on_delete, sender=News, dispatch_uid='news_tag_count_delete')
+
+post_delete.connect(unrate_shaurma, sender=Review, dispatch_uid='rating_review_delete')
+
+post_save.connect(index_shaurma, sender=Shaurma, dispatch_uid='search_index_shaurma')
+post_delete.connect(unindex_shaurma, sender=Shaurma, dispatch_uid='search_unindex_shaurma')
+post_migrate.connect(setup_search_index, sender=apps.get_app_config('main'), dispatch_uid='search_setup')
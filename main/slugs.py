@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+from django.shortcuts import get_object_or_404
+from slugify import slugify
+
+
+# Запас под суффикс «-N» при обрезке slug до max_length поля
+SUFFIX_ROOM = 6
+
+
+def unique_slug( instance, value: str, field: str = 'slug' ) -> str:
+	"""
+	slugify( value ), а если такой slug уже занят другой записью — с суффиксом -2, -3, …
+	Занятые варианты читаются одним запросом по индексу slug.
+	"""
+	model = type( instance )
+	max_length = model._meta.get_field( field ).max_length
+	base = slugify( value, max_length = max_length ) or model._meta.model_name
+
+	prefix = base[ :max_length - SUFFIX_ROOM ]
+	taken = set(
+		model._default_manager
+		.filter( **{ f'{field}__startswith': prefix } )
+		.exclude( pk = instance.pk )
+		.values_list( field, flat = True )
+	)
+
+	slug, number = base, 2
+	while slug in taken:
+		suffix = f'-{number}'
+		slug = base[ :max_length - len( suffix ) ] + suffix
+		number += 1
+	return slug
+
+
+class SlugCache:
+	"""
+	Кэш slug → pk в памяти процесса для детальных страниц. Объект читается по первичному ключу;
+	если slug записи сменился или её удалили, кэш проверяется этим же чтением и ищет заново по slug.
+	"""
+
+	def __init__( self, size: int = 2048 ):
+		self.size = size
+		self._lock = threading.Lock()
+		self._pks = OrderedDict()
+
+	def get_object( self, queryset, slug: str ):
+		"""Объект по slug или Http404."""
+		key = ( queryset.model._meta.label_lower, slug )
+		with self._lock:
+			pk = self._pks.get( key )
+			if pk is not None:
+				self._pks.move_to_end( key )
+
+		if pk is not None:
+			obj = queryset.filter( pk = pk ).first()
+			if obj is not None and obj.slug == slug:
+				return obj
+
+		obj = get_object_or_404( queryset, slug = slug )
+		with self._lock:
+			self._pks[ key ] = obj.pk
+			self._pks.move_to_end( key )
+			if len( self._pks ) > self.size:
+				self._pks.popitem( last = False )
+		return obj
+
+	def clear( self ) -> None:
+		with self._lock:
+			self._pks.clear()
+
+
+slug_cache = SlugCache()
@@ -1,9 +1,20 @@
 from django_jinja import library
-from Shaurmania.settings import AVATARS_COUNT
+from Shaurmania.settings import AVATARS_COUNT, PAGE_CACHE_TIMEOUT
+from main import page_cache
 import random
 
 
 @library.global_function()
 def random_image_url():
 	numbers = [ '{:03d}'.format(i) for i in range( 0, AVATARS_COUNT ) ]
-	return '{}.png'.format( random.choice( numbers ) )
\ No newline at end of file
+	return '{}.png'.format( random.choice( numbers ) )
+
+
+@library.global_function()
+def page_cache_timeout():
+	return PAGE_CACHE_TIMEOUT
+
+
+@library.global_function()
+def page_versions( page ):
+	return page_cache.page_versions( page )
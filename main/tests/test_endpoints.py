@@ -1,7 +1,10 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from main.factories import (
+    ShaurmaCategoryFactory,
     ShaurmaFactory,
     StockFactory,
     UserFactory,
@@ -34,6 +37,33 @@ class CatalogAndDetailsTest(TestCase):
         resp = self.client.get(reverse('product', kwargs={'slug': item.slug}))
         self.assertEqual(resp.status_code, 200)
 
+    def _catalog_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('catalog'))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_catalog_query_count_does_not_grow_with_categories(self):
+        ShaurmaFactory(name='Позиция 0', category=ShaurmaCategoryFactory(name='Категория 0'))
+        baseline = self._catalog_queries()
+
+        for i in range(1, 6):
+            category = ShaurmaCategoryFactory(name=f'Категория {i}')
+            ShaurmaFactory(name=f'Позиция {i}-1', category=category)
+            ShaurmaFactory(name=f'Позиция {i}-2', category=category)
+
+        self.assertEqual(self._catalog_queries(), baseline)
+
+    def test_catalog_hides_unavailable_items(self):
+        category = ShaurmaCategoryFactory(name='Классика')
+        ShaurmaFactory(name='Доступная', category=category)
+        ShaurmaFactory(name='Закончилась', category=category, is_available=False)
+
+        resp = self.client.get(reverse('catalog'))
+
+        self.assertContains(resp, 'Доступная')
+        self.assertNotContains(resp, 'Закончилась')
+
     def test_stocks_list_and_detail(self):
         stock = StockFactory()
         resp_list = self.client.get(reverse('stocks'))
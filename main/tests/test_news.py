@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.factories import NewsFactory, NewsTagFactory
+from main.models import News, NewsTag
+
+
+class NewsTagCountTest(TestCase):
+    def setUp(self):
+        self.hot = NewsTagFactory(name='Горячее')
+        self.new = NewsTagFactory(name='Новинки')
+
+    def counts(self):
+        return dict(NewsTag.objects.values_list('name', 'news_count'))
+
+    def test_add_remove_and_clear(self):
+        news = NewsFactory(is_shown=True, tags=[self.hot, self.new])
+        NewsFactory(is_shown=True, tags=[self.hot])
+        self.assertEqual(self.counts(), {'Горячее': 2, 'Новинки': 1})
+
+        news.tags.remove(self.hot)
+        self.assertEqual(self.counts(), {'Горячее': 1, 'Новинки': 1})
+
+        news.tags.clear()
+        self.assertEqual(self.counts(), {'Горячее': 1, 'Новинки': 0})
+
+        self.new.news_set.add(news)
+        self.assertEqual(self.counts(), {'Горячее': 1, 'Новинки': 1})
+
+    def test_hidden_and_deleted_news_not_counted(self):
+        news = NewsFactory(is_shown=True, tags=[self.hot])
+        NewsFactory(is_shown=False, tags=[self.hot])
+        self.assertEqual(self.counts()['Горячее'], 1)
+
+        news.is_shown = False
+        news.save()
+        self.assertEqual(self.counts()['Горячее'], 0)
+
+        news.is_shown = True
+        news.save()
+        News.objects.filter(pk=news.pk).delete()
+        self.assertEqual(self.counts()['Горячее'], 0)
+
+    def test_slug_is_unique(self):
+        self.assertTrue(NewsTag._meta.get_field('slug').unique)
+
+
+class NewsFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tag = NewsTagFactory(name='Горячее')
+
+    def feed_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(ctx.captured_queries)
+
+    def test_queries_do_not_grow_with_news_and_tags(self):
+        NewsFactory(is_shown=True, tags=[self.tag])
+        _, small = self.feed_queries(reverse('news_by_tag', kwargs={'tag_slug': self.tag.slug}))
+
+        for _ in range(5):
+            NewsFactory(is_shown=True, tags=[self.tag, NewsTagFactory()])
+        resp, large = self.feed_queries(reverse('news_by_tag', kwargs={'tag_slug': self.tag.slug}))
+
+        self.assertEqual(large, small)
+        self.assertContains(resp, 'tag__count">6<')
+
+    def test_cloud_hides_empty_tags(self):
+        NewsTagFactory(name='Пустой')
+        NewsFactory(is_shown=True, tags=[self.tag])
+
+        resp, _ = self.feed_queries(reverse('news'))
+
+        self.assertContains(resp, 'Горячее')
+        self.assertNotContains(resp, 'Пустой')
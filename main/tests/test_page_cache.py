@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cart.models import Cart
+from main.factories import ShaurmaCategoryFactory, ShaurmaFactory, StockFactory, UserFactory
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ShaurmaCategoryFactory(name='Классика')
+        self.item = ShaurmaFactory(name='Классическая', category=self.category, price=100, is_featured=True)
+
+    def _shaurma_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp, [q['sql'] for q in ctx.captured_queries if 'FROM "main_shaurma"' in q['sql']]
+
+    def test_second_hit_skips_catalog_queries(self):
+        for name in ('catalog', 'index'):
+            with self.subTest(name=name):
+                self._shaurma_queries(reverse(name))
+                resp, queries = self._shaurma_queries(reverse(name))
+
+                self.assertEqual(queries, [])
+                self.assertContains(resp, 'Классическая')
+
+    def test_model_change_invalidates_fragment(self):
+        self.client.get(reverse('catalog'))
+
+        self.item.name = 'Сырная'
+        self.item.save()
+        resp, queries = self._shaurma_queries(reverse('catalog'))
+
+        self.assertTrue(queries)
+        self.assertContains(resp, 'Сырная')
+        self.assertNotContains(resp, 'Классическая')
+
+    def test_category_rename_invalidates_product(self):
+        url = reverse('product', kwargs={'slug': self.item.slug})
+        self.assertContains(self.client.get(url), 'Классика')
+
+        self.category.name = 'Острая'
+        self.category.save()
+        resp = self.client.get(url)
+
+        self.assertContains(resp, 'Острая')
+        self.assertNotContains(resp, 'Классика')
+
+    def test_delete_invalidates_stocks(self):
+        stock = StockFactory(name='Двойная')
+        self.assertContains(self.client.get(reverse('stocks')), 'Двойная')
+
+        stock.delete()
+
+        self.assertNotContains(self.client.get(reverse('stocks')), 'Двойная')
+
+    def test_cart_counters_stay_out_of_cache(self):
+        self.client.get(reverse('catalog'))
+
+        user = UserFactory()
+        Cart.objects.set_quantities({'user': user}, {self.item.id: 3})
+        self.client.force_login(user)
+        for name in ('catalog', 'index'):
+            with self.subTest(name=name):
+                resp, queries = self._shaurma_queries(reverse(name))
+                resp, queries = self._shaurma_queries(reverse(name))
+
+                # Карточки из кэша и с товарами в корзине, количества — отдельно от фрагмента
+                self.assertEqual(queries, [])
+                content = resp.content.decode()
+                self.assertIn('data-cart-quantities>{"%d": 3}<' % self.item.id, content)
+                self.assertRegex(content, r'data-cart-count\s*>3<')
+                self.assertNotRegex(content, r'data-cart-inline-qty\s+data-cart-item="%d"\s*>\s*3\s*<' % self.item.id)
+
+        product = self.client.get(reverse('product', kwargs={'slug': self.item.slug}))
+        self.assertRegex(product.content.decode(), r'data-cart-item="%d"\s*>\s*3\s*<' % self.item.id)
@@ -0,0 +1,75 @@
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main.factories import ReviewFactory
+from main.models import Review
+from main.pagination import CursorPaginator
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        # Половина отзывов с одинаковым временем: порядок внутри — по id
+        now = timezone.now()
+        self.reviews = [ReviewFactory(shaurma=None, stars=5) for _ in range(7)]
+        for i, review in enumerate(self.reviews):
+            Review.objects.filter(pk=review.pk).update(date=now - timedelta(minutes=i // 2))
+        self.expected = list(Review.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.paginator = CursorPaginator(Review.objects.all(), 3, ordering=('-date', '-id'))
+
+    def ids(self, page):
+        return [review.id for review in page]
+
+    def test_walk_forward_and_back(self):
+        first = self.paginator.page(None)
+        second = self.paginator.page(first.next_cursor)
+        third = self.paginator.page(second.next_cursor)
+
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), self.expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        self.assertEqual(self.ids(self.paginator.page(third.previous_cursor)), self.ids(second))
+        self.assertEqual(self.ids(self.paginator.page(second.previous_cursor)), self.ids(first))
+
+    def test_bad_cursor_gives_first_page(self):
+        for cursor in ('garbage', 'WyJ4Il0', ''):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.ids(self.paginator.page(cursor)), self.expected[:3])
+
+    def test_no_count_or_offset(self):
+        cursor = self.paginator.page(None).next_cursor
+
+        with CaptureQueriesContext(connection) as ctx:
+            list(self.paginator.page(cursor))
+
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries).upper()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+
+class FeedPaginationViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        ReviewFactory.create_batch(55, shaurma=None, stars=4)
+
+    def test_feedback_xhr_follows_next_cursor(self):
+        resp = self.client.get(reverse('feedback'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        cursor = re.search(r'\?cursor=([\w-]+)', resp.content.decode()).group(1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('feedback'), {'cursor': cursor}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(resp.content.decode().count('class="part-comment"'), 5)
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+
+    def test_old_page_param_is_ignored(self):
+        self.assertEqual(self.client.get(reverse('news'), {'page': 3}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('locations'), {'cursor': 'broken'}).status_code, 200)
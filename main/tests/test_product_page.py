@@ -0,0 +1,77 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.factories import ReviewFactory, ShaurmaFactory, ShaurmaImageFactory
+from main.views.catalog import PRODUCT_REVIEWS_LIMIT
+
+
+# Товар с категорией, фото и отзывы: пустая корзина анонимного посетителя запросов не даёт
+PRODUCT_PAGE_MAX_QUERIES = 3
+
+
+@pytest.fixture
+def product():
+    cache.clear()
+    return ShaurmaFactory(name='Классическая')
+
+
+def get_page(client, item):
+    cache.clear()
+    resp = client.get(reverse('product', kwargs={'slug': item.slug}))
+    assert resp.status_code == 200
+    return resp.content.decode()
+
+
+@pytest.mark.django_db
+def test_product_page_query_budget(client, product, django_assert_max_num_queries):
+    ShaurmaImageFactory.create_batch(5, shaurma=product)
+    ReviewFactory.create_batch(PRODUCT_REVIEWS_LIMIT + 10, shaurma=product, stars=4)
+
+    with django_assert_max_num_queries(PRODUCT_PAGE_MAX_QUERIES):
+        content = get_page(client, product)
+
+    assert content.count('class="part-comment"') == PRODUCT_REVIEWS_LIMIT
+    assert content.count('class="slider__slide"') == 5
+    assert product.category.name in content
+
+
+@pytest.mark.django_db
+def test_product_page_cost_is_constant(client, product, django_assert_num_queries):
+    ReviewFactory(shaurma=product, stars=5)
+    ShaurmaImageFactory(shaurma=product)
+
+    with CaptureQueriesContext(connection) as small:
+        get_page(client, product)
+
+    ShaurmaImageFactory.create_batch(6, shaurma=product)
+    ReviewFactory.create_batch(30, shaurma=product, stars=3)
+
+    with django_assert_num_queries(len(small.captured_queries)):
+        get_page(client, product)
+
+
+@pytest.mark.django_db
+def test_images_follow_order(client, product):
+    ShaurmaImageFactory(shaurma=product, order=2, caption='Второе')
+    ShaurmaImageFactory(shaurma=product, order=1, caption='Первое')
+
+    content = get_page(client, product)
+    assert content.index('Первое') < content.index('Второе')
+
+
+@pytest.mark.django_db
+def test_cached_fragments_skip_images_and_reviews(client, product, django_assert_max_num_queries):
+    ReviewFactory.create_batch(3, shaurma=product, stars=5)
+    ShaurmaImageFactory.create_batch(2, shaurma=product)
+
+    url = reverse('product', kwargs={'slug': product.slug})
+    client.get(url)
+
+    # Фрагменты в кэше: фото и отзывы не читаются
+    with django_assert_max_num_queries(PRODUCT_PAGE_MAX_QUERIES - 2) as ctx:
+        resp = client.get(url)
+    assert resp.status_code == 200
+    assert not any('main_review' in q['sql'] or 'main_shaurmaimage' in q['sql'] for q in ctx.captured_queries)
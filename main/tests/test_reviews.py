@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.factories import ReviewFactory, ShaurmaFactory
+from main.models import Review, Shaurma
+
+
+class ShaurmaRatingTest(TestCase):
+    def setUp(self):
+        self.item = ShaurmaFactory(name='Классическая')
+
+    def rating(self, item=None):
+        item = Shaurma.objects.get(pk=(item or self.item).pk)
+        return item.rating_count, item.rating_sum, [count for _, count, _ in item.rating_histogram]
+
+    def test_create_and_delete_update_totals(self):
+        ReviewFactory(shaurma=self.item, stars=5)
+        ReviewFactory(shaurma=self.item, stars=5)
+        review = ReviewFactory(shaurma=self.item, stars=2)
+
+        self.assertEqual(self.rating(), (3, 12, [2, 0, 0, 1, 0]))
+        self.assertEqual(Shaurma.objects.get(pk=self.item.pk).rating, 4.0)
+
+        review.delete()
+        self.assertEqual(self.rating(), (2, 10, [2, 0, 0, 0, 0]))
+
+        Review.objects.filter(shaurma=self.item).delete()
+        self.assertEqual(self.rating(), (0, 0, [0, 0, 0, 0, 0]))
+        self.assertIsNone(Shaurma.objects.get(pk=self.item.pk).rating)
+
+    def test_edit_moves_rating_between_items(self):
+        other = ShaurmaFactory(name='Сырная')
+        review = ReviewFactory(shaurma=self.item, stars=4)
+
+        review.stars = 1
+        review.shaurma = other
+        review.save()
+
+        self.assertEqual(self.rating(), (0, 0, [0, 0, 0, 0, 0]))
+        self.assertEqual(self.rating(other), (1, 1, [0, 0, 0, 0, 1]))
+
+    def test_histogram_percent(self):
+        for stars in (5, 5, 5, 4):
+            ReviewFactory(shaurma=self.item, stars=stars)
+
+        item = Shaurma.objects.get(pk=self.item.pk)
+        self.assertEqual(item.rating_histogram[:2], [(5, 3, 75), (4, 1, 25)])
+
+
+class ProductReviewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = ShaurmaFactory(name='Классическая')
+
+    def product_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('product', kwargs={'slug': self.item.slug}))
+        self.assertEqual(resp.status_code, 200)
+        return resp, len(ctx.captured_queries)
+
+    def test_page_cost_does_not_grow_with_reviews(self):
+        ReviewFactory(shaurma=self.item, stars=1)
+        _, small = self.product_queries()
+
+        ReviewFactory.create_batch(40, shaurma=self.item, stars=5)
+        resp, large = self.product_queries()
+
+        self.assertEqual(large, small)
+        self.assertEqual(resp.content.decode().count('class="part-comment"'), 20)
+        self.assertContains(resp, '41 отз.')
+        self.assertContains(resp, '4.9')
+
+    def test_latest_reviews_first(self):
+        ReviewFactory(shaurma=self.item, name='Старый', stars=3)
+        ReviewFactory(shaurma=self.item, name='Новый', stars=4)
+
+        resp, _ = self.product_queries()
+
+        content = resp.content.decode()
+        self.assertLess(content.index('Новый'), content.index('Старый'))
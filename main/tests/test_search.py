@@ -0,0 +1,144 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.factories import ShaurmaCategoryFactory, ShaurmaFactory
+from main.search import get_search_backend
+from main.search.backends import BaseSearchBackend, SimpleSearchBackend
+from main.search.suggest import SuggestIndex, layout_variants
+from main.search.text import stem
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        for forms in (('шаурма', 'шаурмой', 'шаурмы'), ('сырная', 'сырный', 'сырной'), ('курица', 'курицей')):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_short_and_latin_words_untouched(self):
+        self.assertEqual(stem('соус'), 'соус')
+        self.assertEqual(stem('cheese'), 'cheese')
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.classic = ShaurmaFactory(
+            name='Классическая', compound='Лаваш, курица, огурцы, соус', short_text='', description='',
+        )
+        self.cheese = ShaurmaFactory(
+            name='Сырная шаурма', compound='Лаваш, сыр, говядина', short_text='', description='',
+        )
+        self.veggie = ShaurmaFactory(
+            name='Овощная', compound='Лаваш, овощи', short_text='', description='Лучше любой шаурмы с мясом',
+        )
+        self.backend = get_search_backend()
+
+    def test_word_forms_prefix_and_case(self):
+        self.assertEqual(self.backend.search('курицей'), [self.classic.id])
+        self.assertEqual(self.backend.search('СЫРН'), [self.cheese.id])
+        self.assertEqual(self.backend.search('говяд'), [self.cheese.id])
+
+    def test_name_ranks_above_description(self):
+        self.assertEqual(self.backend.search('шаурмой'), [self.cheese.id, self.veggie.id])
+
+    def test_all_terms_required(self):
+        self.assertEqual(self.backend.search('лаваш овощи'), [self.veggie.id])
+
+    def test_fts_syntax_in_query_is_escaped(self):
+        self.assertEqual(self.backend.search('курица" OR NEAR('), [])
+        self.assertEqual(self.backend.search('*** ""'), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.classic.compound = 'Лаваш, индейка'
+        self.classic.save()
+        self.assertEqual(self.backend.search('курица'), [])
+        self.assertEqual(self.backend.search('индейка'), [self.classic.id])
+
+        self.cheese.delete()
+        self.assertEqual(self.backend.search('сыр'), [])
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+
+        self.assertIn('проиндексировано товаров 3', out.getvalue())
+        self.assertEqual(self.backend.search('курица'), [self.classic.id])
+
+    def test_rebuild_command_on_fresh_install_indexes_once(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {self.backend.TABLE}')
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('rebuild_search_index', stdout=StringIO())
+
+        rebuilds = [q for q in ctx.captured_queries if q['sql'] == f'DELETE FROM {self.backend.TABLE}']
+        self.assertEqual(len(rebuilds), 1)
+        self.assertEqual(self.backend.search('курица'), [self.classic.id])
+
+    def test_backend_must_implement_search(self):
+        with self.assertRaises(TypeError):
+            BaseSearchBackend()
+
+    def test_simple_backend_matches_index(self):
+        simple = SimpleSearchBackend()
+        self.assertEqual(simple.search('курицей'), [self.classic.id])
+        self.assertEqual(simple.search('шаурмой'), [self.cheese.id, self.veggie.id])
+
+    def test_search_view_keeps_rank_order(self):
+        resp = self.client.get(reverse('search'), {'search': 'шаурма'})
+
+        content = resp.content.decode()
+        self.assertLess(content.index('Сырная шаурма'), content.index('Овощная'))
+
+
+class SuggestIndexTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ShaurmaCategoryFactory(name='Острые')
+        self.chicken = ShaurmaFactory(name='Шаурма с курицей', category=None)
+        self.cheese = ShaurmaFactory(name='Сырная шаурма', category=self.category)
+        self.index = SuggestIndex()
+
+    def names(self, query, limit=8):
+        return [item['name'] for item in self.index.suggest(query, limit)]
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.names('сыр'), ['Сырная шаурма'])
+        self.assertEqual(self.names('ШАУР'), ['Сырная шаурма', 'Шаурма с курицей'])
+        self.assertEqual(self.names('шаур', limit=1), ['Сырная шаурма'])
+
+    def test_one_typo_tolerated(self):
+        self.assertEqual(self.names('шпурма кур'), ['Шаурма с курицей'])
+        self.assertEqual(self.names('курциа'), [])
+
+    def test_short_words_match_exactly(self):
+        self.assertEqual(self.names('сы'), ['Сырная шаурма'])
+        self.assertEqual(self.names('ку'), ['Шаурма с курицей'])
+
+    def test_wrong_keyboard_layout(self):
+        self.assertIn('шаурма', layout_variants('ifehvf'))
+        self.assertEqual(self.names('ifehvf c r'), ['Шаурма с курицей'])
+
+    def test_category_name_ranks_below_product_name(self):
+        hot = ShaurmaFactory(name='Острая', category=None)
+
+        self.assertEqual(self.names('остр'), ['Острая', 'Сырная шаурма'])
+        self.assertEqual(self.index.suggest('остр')[0]['slug'], hot.slug)
+
+    def test_rebuilt_after_change(self):
+        self.assertEqual(self.names('сыр'), ['Сырная шаурма'])
+
+        self.cheese.is_available = False
+        self.cheese.save()
+        self.assertEqual(self.names('сыр'), [])
+
+        self.category.name = 'Сырные'
+        self.category.save()
+        self.chicken.category = self.category
+        self.chicken.save()
+        self.assertEqual(self.names('сыр'), ['Шаурма с курицей'])
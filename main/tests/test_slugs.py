@@ -0,0 +1,74 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.factories import LocationFactory, NewsFactory, ShaurmaFactory, StockFactory
+from main.models import Location, Shaurma, Stock
+from main.slugs import slug_cache
+
+
+class UniqueSlugTest(TestCase):
+    def test_collisions_get_suffix(self):
+        first = StockFactory(name='Скидка дня')
+        second = StockFactory(name='Скидка дня')
+        third = StockFactory(name='Скидка  дня!')
+
+        self.assertEqual(first.slug, 'skidka-dnia')
+        self.assertEqual(second.slug, 'skidka-dnia-2')
+        self.assertEqual(third.slug, 'skidka-dnia-3')
+
+    def test_suffix_fits_max_length(self):
+        name = 'Очень длинное название заведения на главной улице города'
+        slugs = {LocationFactory(name=name).slug for _ in range(3)}
+
+        self.assertEqual(len(slugs), 3)
+        self.assertTrue(all(len(slug) <= Location._meta.get_field('slug').max_length for slug in slugs))
+
+    def test_resave_keeps_own_slug(self):
+        item = ShaurmaFactory(name='Классическая')
+        slug = item.slug
+
+        item.slug = ''
+        item.save()
+
+        self.assertEqual(item.slug, slug)
+
+    def test_slug_fields_are_unique(self):
+        for model in (Shaurma, Stock, Location):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(model._meta.get_field('slug').unique)
+
+
+class DetailPageSlugTest(TestCase):
+    def setUp(self):
+        slug_cache.clear()
+
+    def test_missing_slug_is_404(self):
+        for name in ('product', 'news_detail', 'stock', 'location'):
+            with self.subTest(name=name):
+                resp = self.client.get(reverse(name, kwargs={'slug': 'net-takogo'}))
+                self.assertEqual(resp.status_code, 404)
+
+    def test_cached_slug_resolves_by_pk(self):
+        news = NewsFactory(is_shown=True)
+        url = reverse('news_detail', kwargs={'slug': news.slug})
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        lookup = [q['sql'] for q in ctx.captured_queries if 'FROM "main_news"' in q['sql']]
+        self.assertEqual(len(lookup), 1)
+        self.assertIn('"main_news"."id" =', lookup[0])
+
+    def test_renamed_slug_is_not_served_from_cache(self):
+        stock = StockFactory(name='Двойная')
+        old_url = reverse('stock', kwargs={'slug': stock.slug})
+        self.assertEqual(self.client.get(old_url).status_code, 200)
+
+        stock.slug = 'dvoinaia-novaia'
+        stock.save()
+
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('stock', kwargs={'slug': 'dvoinaia-novaia'})).status_code, 200)
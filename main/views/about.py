@@ -1,9 +1,9 @@
 from django.shortcuts import render
-from django.core.paginator import Paginator
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 
 from main.models import Review
+from main.pagination import CursorPaginator
 
 
 def about( request ):
@@ -11,11 +11,8 @@ def about( request ):
 
 
 def feedback(request):
-	reviews = Review.objects.all()
-	paginator = Paginator( reviews, 50 )
-
-	page_number = request.GET.get( 'page' )
-	page_obj = paginator.get_page( page_number )
+	# Новые отзывы первыми; курсор вместо номера страницы — без COUNT(*) и OFFSET
+	page_obj = CursorPaginator( Review.objects.all(), 50, ordering = ( '-date', '-id' ) ).page( request.GET.get( 'cursor' ) )
 
 	ctx = {
 		'page_obj': page_obj
@@ -1,70 +1,112 @@
+from functools import cached_property
+
 from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
 
-from django.db.models import Count
+from django.db.models import Prefetch, prefetch_related_objects
 
 from main.models import Review, Shaurma, ShaurmaCategory, Stock, ShaurmaImage
-from cart.models import Order
-from cart.models import Cart
+from main.search import get_search_backend
+from main.slugs import slug_cache
+from cart.models import ShaurmaStats
+from cart.middleware import get_request_cart
 
 
-def _get_cart_quantity_map(request):
-	if request.user.is_authenticated:
-		rows = Cart.objects.filter(user=request.user).values_list('item_id', 'quanity')
-	else:
-		if not request.session.session_key:
-			request.session.save()
-		rows = Cart.objects.filter(session_key=request.session.session_key).values_list('item_id', 'quanity')
+INDEX_MAX_LIMIT = 24
+
+# Сколько последних отзывов выводит страница товара: итоги оценок хранятся в самом товаре
+PRODUCT_REVIEWS_LIMIT = 20
+
+
+def _index_shaurma( mode, limit ):
+	featured = list(Shaurma.objects.filter(is_featured=True, is_available=True)[:limit])
+	if featured or mode == 'featured':
+		return featured
 
-	return {item_id: qty for item_id, qty in rows}
+	# Готовый топ из ShaurmaStats по индексу, без агрегата по всем позициям заказов
+	popular = ShaurmaStats.objects.filter(shaurma__is_available=True, order_count__gt=0).select_related('shaurma')
+	return [stats.shaurma for stats in popular.order_by('-order_count', 'shaurma_id')[:limit]]
 
 
 def index( request ):
-	mode = request.GET.get('mode')  # 'featured' or 'popular'
+	mode = 'featured' if request.GET.get('mode') == 'featured' else 'popular'
 	try:
-		limit = int(request.GET.get('limit', 6))
+		limit = max(1, min(int(request.GET.get('limit', 6)), INDEX_MAX_LIMIT))
 	except (TypeError, ValueError):
 		limit = 6
 
-	stocks = Stock.objects.all()
-
-	if mode == 'featured':
-		shaurma = Shaurma.objects.filter(is_featured=True, is_available=True)[:limit]
-	else:
-		featured = Shaurma.objects.filter(is_featured=True, is_available=True)
-		if featured.exists():
-			shaurma = featured[:limit]
-		else:
-			popular_ids = Order.objects.values('shaurma').annotate(cnt=Count('id')).order_by('-cnt').values_list('shaurma', flat=True)[:limit]
-			shaurma = Shaurma.objects.filter(id__in=list(popular_ids), is_available=True)
-
 	ctx = {
-		'shaurma': shaurma,
-		'stocks': stocks,
-		'cart_quantities': _get_cart_quantity_map(request),
+		# Ленивые: при попадании в кэш фрагментов запросов к товарам и акциям нет
+		'shaurma': SimpleLazyObject(lambda: _index_shaurma(mode, limit)),
+		'stocks': Stock.objects.all(),
+		'mode': mode,
+		'limit': limit,
+		'cart_quantities': get_request_cart(request).quantities,
 	}
 	return render( request, 'main/index.jinja', context = ctx )
 
 
+# Колонки, которые выводит карточка каталога
+CATALOG_FIELDS = ( 'id', 'category_id', 'name', 'short_text', 'picture', 'price' )
+
+
 def catalog(request):
-	shaurma = ShaurmaCategory.objects.all()
+	# Категории и все доступные позиции — два запроса независимо от числа категорий
+	available = Shaurma.objects.filter( is_available = True ).order_by( 'name' ).only( *CATALOG_FIELDS )
+	shaurma = ShaurmaCategory.objects.prefetch_related(
+		Prefetch( 'shaurmas', queryset = available, to_attr = 'available_shaurmas' )
+	)
 
 	ctx = {
 		'shaurma': shaurma,
-		'cart_quantities': _get_cart_quantity_map(request),
+		'cart_quantities': get_request_cart(request).quantities,
 	}
 	return render( request, 'main/catalog.jinja', context = ctx )
 
 
+class ProductPage:
+	"""
+	Всё, что выводит страница товара: товар с категорией, фото по порядку, последние отзывы и итоги оценок.
+	Товар с категорией — один запрос ( он нужен и вне кэша фрагментов ), фото и отзывы — ещё по одному
+	при первом обращении из шаблона, то есть только при промахе кэша. Оценки хранятся в самом товаре.
+	"""
+
+	def __init__( self, product: Shaurma ):
+		self.product = product
+
+	@classmethod
+	def load( cls, slug: str ) -> 'ProductPage':
+		return cls( slug_cache.get_object( Shaurma.objects.select_related( 'category' ), slug ) )
+
+	@cached_property
+	def _related( self ) -> Shaurma:
+		prefetch_related_objects(
+			[ self.product ],
+			Prefetch( 'images', queryset = ShaurmaImage.objects.order_by( 'order', 'id' ), to_attr = 'ordered_images' ),
+			Prefetch(
+				'review_set',
+				queryset = Review.objects.order_by( '-date', '-id' )[ :PRODUCT_REVIEWS_LIMIT ],
+				to_attr = 'latest_reviews',
+			),
+		)
+		return self.product
+
+	@property
+	def photos( self ) -> list:
+		return self._related.ordered_images
+
+	@property
+	def reviews( self ) -> list:
+		return self._related.latest_reviews
+
+
 def product( request, slug ):
-	product = Shaurma.objects.get( slug = slug )
-	reviews = Review.objects.filter( shaurma = product.id )
-	photos  = ShaurmaImage.objects.filter( shaurma = product.id )
+	page = ProductPage.load( slug )
 
 	ctx = {
-		'product': product,
-		'reviews': reviews,
-		'photos' : photos,
-		'cart_quantities': _get_cart_quantity_map(request),
+		'product': page.product,
+		'page'   : page,
+		'cart_quantities': get_request_cart(request).quantities,
 	}
 
 	return render( request, 'main/product.jinja', context = ctx )
@@ -75,7 +117,10 @@ def search(request):
 		query = request.GET['search']
 
 		if query:
-			finded_rows = Shaurma.objects.filter( name__icontains = query )
+			# Индекс отдаёт id по релевантности, товары читаются одним запросом
+			ids = get_search_backend().search( query )
+			found = Shaurma.objects.only( 'id', 'name', 'slug' ).in_bulk( ids )
+			finded_rows = [ found[ pk ] for pk in ids if pk in found ]
 
 			ctx = {
 				'search': f'Найдено по запросу "{query}"',
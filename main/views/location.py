@@ -1,17 +1,14 @@
 from django.shortcuts import render
-from django.core.paginator import Paginator
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 
 from main.models import Location
+from main.pagination import CursorPaginator
+from main.slugs import slug_cache
 
 
 def locations( request ):
-	locations = Location.objects.all()
-	paginator = Paginator( locations, 5 )
-
-	page_number = request.GET.get( 'page' )
-	page_obj = paginator.get_page( page_number )
+	page_obj = CursorPaginator( Location.objects.all(), 5 ).page( request.GET.get( 'cursor' ) )
 
 	ctx = {
 		'page_obj': page_obj
@@ -27,7 +24,7 @@ def locations( request ):
 
 
 def location( request, slug ):
-	location_detail = Location.objects.get( slug = slug )
+	location_detail = slug_cache.get_object( Location.objects.all(), slug )
 
 	ctx = {
 		'location_detail': location_detail,
@@ -1,24 +1,24 @@
 from django.shortcuts import get_object_or_404, render
-from django.core.paginator import Paginator
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 
 from main.models import News, NewsTag
+from main.pagination import CursorPaginator
+from main.slugs import slug_cache
 
 
 def news( request, tag_slug=None ):
-	news_list   = News.objects.filter(is_shown=True).order_by('-created_at')
-	all_tags    = NewsTag.objects.all()
+	# Теги всех новостей страницы — одним запросом, а не по запросу на карточку
+	news_list   = News.objects.filter(is_shown=True).prefetch_related('tags')
+	all_tags    = NewsTag.objects.filter(news_count__gt=0)
 	current_tag = None
 
 	if tag_slug:
 		current_tag = get_object_or_404( NewsTag, slug = tag_slug )
-		news_list = news_list.filter( tags__slug = current_tag.slug )
+		# По id тега: только индекс таблицы связей, без JOIN с тегами
+		news_list = news_list.filter( tags = current_tag )
 
-	paginator = Paginator( news_list, 20 )
-
-	page_number = request.GET.get('page')
-	page_obj = paginator.get_page( page_number )
+	page_obj = CursorPaginator( news_list, 20 ).page( request.GET.get( 'cursor' ) )
 
 	ctx = {
 		'all_tags'   : all_tags,
@@ -36,7 +36,7 @@ def news( request, tag_slug=None ):
 
 
 def news_detail( request, slug ):
-	news_detail = News.objects.get( slug = slug )
+	news_detail = slug_cache.get_object( News.objects.all(), slug )
 
 	ctx = {
 		'news_detail': news_detail,
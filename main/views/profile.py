@@ -1,6 +1,7 @@
+from django.db.models import Prefetch
 from django.shortcuts import render, redirect, get_object_or_404
 from main.models import User
-from cart.models import Order
+from cart.models import OrderHeader, OrderLine
 
 
 def user(request, username):
@@ -12,21 +13,12 @@ def user(request, username):
 
 	order_history = []
 	if is_owner:
-		rows = Order.objects.filter(user=profile_user).select_related('shaurma', 'promocode').order_by('-date')
-		order_map = {}
-		for row in rows:
-			if row.order_code not in order_map:
-				order_map[row.order_code] = {
-					'order_code': row.order_code,
-					'date': row.date,
-					'subtotal': row.order_subtotal,
-					'discount': row.order_discount,
-					'total': row.order_total,
-					'promocode': row.promocode.code_name if row.promocode else None,
-					'order_lines': [],
-				}
-			order_map[row.order_code]['order_lines'].append(row)
-		order_history = list(order_map.values())
+		order_history = (
+			OrderHeader.objects
+			.filter(user=profile_user)
+			.select_related('promocode')
+			.prefetch_related(Prefetch('lines', queryset=OrderLine.objects.select_related('shaurma')))
+		)
 
 	return render( request, 'main/user.jinja', {
 		'profile_user': profile_user,
@@ -1,5 +1,6 @@
 from django.shortcuts import render
 from main.models import Stock
+from main.slugs import slug_cache
 
 
 def stocks(request):
@@ -13,7 +14,7 @@ def stocks(request):
 
 
 def stock( request, slug ):
-	stock = Stock.objects.get( slug = slug )
+	stock = slug_cache.get_object( Stock.objects.all(), slug )
 
 	ctx = {
 		'stock': stock,
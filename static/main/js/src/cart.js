@@ -16,6 +16,15 @@ document.addEventListener('DOMContentLoaded', function () {
         }, 1300);
     }
 
+    function updateInlineQuantities(qtyById) {
+        document.querySelectorAll('[data-cart-inline-qty]').forEach(function (counterEl) {
+            const itemId = parseInt(counterEl.getAttribute('data-cart-item'), 10);
+            const qty = qtyById[itemId] || 0;
+            counterEl.textContent = qty;
+            counterEl.style.display = qty > 0 ? 'inline-flex' : 'none';
+        });
+    }
+
     function updateCartSummary(data) {
         const totalEl = document.querySelector('[data-cart-total]');
         if (totalEl && typeof data.total !== 'undefined') {
@@ -49,12 +58,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 }
             });
 
-            document.querySelectorAll('[data-cart-inline-qty]').forEach(function (counterEl) {
-                const itemId = parseInt(counterEl.getAttribute('data-cart-item'), 10);
-                const qty = qtyById[itemId] || 0;
-                counterEl.textContent = qty;
-                counterEl.style.display = qty > 0 ? 'inline-flex' : 'none';
-            });
+            updateInlineQuantities(qtyById);
 
             document.querySelectorAll('[data-cart-item]').forEach(function (row) {
                 const itemId = parseInt(row.getAttribute('data-cart-item'), 10);
@@ -72,6 +76,36 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    const CART_STATE_URL = '/api/cart';
+
+    // Позиции нужны только там, где на странице есть строки/счётчики товаров, иначе хватает бейджа
+    function cartFields() {
+        return document.querySelector('[data-cart-item]') ? 'count,total,items' : 'count,total';
+    }
+
+    function withFields(url) {
+        return url + (url.indexOf('?') === -1 ? '?' : '&') + 'fields=' + cartFields();
+    }
+
+    // Состояние корзины после возврата на вкладку: браузер сам пришлёт If-None-Match,
+    // и при неизменной версии сервер ответит 304 без тела
+    function refreshCartState() {
+        fetch(withFields(CART_STATE_URL), {
+            headers: {'Accept': 'application/json'},
+            credentials: 'same-origin',
+            cache: 'no-cache'
+        })
+            .then(function (response) {
+                return response.ok ? response.json() : null;
+            })
+            .then(function (data) {
+                if (data) updateCartSummary(data);
+            })
+            .catch(function (err) {
+                console.error('Cart state error:', err);
+            });
+    }
+
     function handleCartClick(e) {
         const link = e.target.closest('[data-cart-action]');
         if (!link) return;
@@ -81,7 +115,7 @@ document.addEventListener('DOMContentLoaded', function () {
         const action = link.getAttribute('data-cart-action') || 'add';
         if (!url) return;
 
-        fetch(url, {
+        fetch(withFields(url), {
             method: 'GET',
             headers: {
                 'X-Requested-With': 'XMLHttpRequest',
@@ -105,6 +139,19 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     }
 
+    // Карточки каталога и главной приходят из кэша фрагментов без счётчиков —
+    // количества корзины страница отдаёт отдельно (main/_parts/cart_quantities.jinja)
+    const quantitiesEl = document.querySelector('[data-cart-quantities]');
+    if (quantitiesEl) {
+        updateInlineQuantities(JSON.parse(quantitiesEl.textContent));
+    }
+
     document.addEventListener('click', handleCartClick);
+    document.addEventListener('visibilitychange', function () {
+        if (document.visibilityState === 'visible') refreshCartState();
+    });
+    window.addEventListener('pageshow', function (e) {
+        if (e.persisted) refreshCartState();
+    });
 });
 
@@ -0,0 +1,60 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const input = document.querySelector('[data-search-suggest]');
+    if (!input) return;
+
+    const list = document.createElement('ul');
+    list.className = 'search-suggest';
+    list.hidden = true;
+    input.parentNode.appendChild(list);
+
+    let timer = null;
+    let controller = null;
+
+    function render(suggestions) {
+        list.innerHTML = '';
+        suggestions.forEach(function (item) {
+            const li = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = item.url;
+            link.textContent = item.name;
+            li.appendChild(link);
+            list.appendChild(li);
+        });
+        list.hidden = suggestions.length === 0;
+    }
+
+    function load() {
+        const query = input.value.trim();
+        if (!query) {
+            render([]);
+            return;
+        }
+
+        // Ответ на устаревший запрос не должен перезаписать подсказки к новому тексту
+        if (controller) controller.abort();
+        controller = new AbortController();
+
+        fetch(input.dataset.searchSuggest + '?q=' + encodeURIComponent(query), {
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            signal: controller.signal
+        })
+        .then(response => response.json())
+        .then(data => render(data.suggestions || []))
+        .catch(err => {
+            if (err.name !== 'AbortError') console.error(err);
+        });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(load, 150);
+    });
+
+    input.addEventListener('keydown', function (e) {
+        if (e.key === 'Escape') list.hidden = true;
+    });
+
+    document.addEventListener('click', function (e) {
+        if (!list.contains(e.target) && e.target !== input) list.hidden = true;
+    });
+});